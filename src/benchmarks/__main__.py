@@ -0,0 +1,269 @@
+"""Benchmarks that drive the app in-process.
+
+    python -m benchmarks http sqlite+aiosqlite:////tmp/bench.db \\
+        --save baseline.json
+    python -m benchmarks http sqlite+aiosqlite:////tmp/bench.db \\
+        --compare baseline.json
+    python -m benchmarks serialization sqlite+aiosqlite:////tmp/bench.db
+    python -m benchmarks chat --clients 2000 --slow 20
+
+The http database is dropped and reseeded on every run, never point it at
+a real one. The remaining settings come from the environment or .env as for the
+app.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+
+def int_list(value: str):
+    return tuple(int(part) for part in value.split(","))
+
+
+def parse_args(argv):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--redis-url",
+        help="use a real Redis instead of the in-memory one",
+    )
+    common.add_argument("--save", help="write the results as JSON")
+    common.add_argument("--compare", help="baseline JSON to compare against")
+    common.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="allowed p95/throughput regression, 0.1 is 10%%",
+    )
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    dataset = argparse.ArgumentParser(add_help=False)
+    dataset.add_argument("database_url", help="scratch database URL")
+    dataset.add_argument("--users", type=int, default=20)
+    dataset.add_argument("--notes-per-user", type=int, default=50)
+    dataset.add_argument("--categories", type=int, default=10)
+    dataset.add_argument(
+        "--categories-per-note",
+        type=int_list,
+        default=(0, 1, 1, 2, 3),
+        help="category counts to draw from for every note, e.g. 0,1,1,2",
+    )
+    dataset.add_argument("--random-seed", type=int, default=0)
+    dataset.add_argument("--requests", type=int, default=500)
+    dataset.add_argument("--concurrency", type=int, default=10)
+    dataset.add_argument("--warmup", type=int, default=20)
+
+    http = commands.add_parser(
+        "http", parents=[common, dataset], help="API and web endpoints"
+    )
+    http.add_argument(
+        "--scenario",
+        action="append",
+        help="run only these scenarios (repeatable)",
+    )
+
+    commands.add_parser(
+        "serialization",
+        parents=[common, dataset],
+        help="response models against the orjson row path",
+    )
+
+    chat = commands.add_parser(
+        "chat", parents=[common], help="websocket chat fan-out"
+    )
+    chat.add_argument("--clients", type=int, default=1000)
+    chat.add_argument("--join-concurrency", type=int, default=100)
+    chat.add_argument(
+        "--history", type=int, default=50, help="messages replayed on join"
+    )
+    chat.add_argument("--messages", type=int, default=200)
+    chat.add_argument(
+        "--rate", type=float, default=50.0, help="messages per second"
+    )
+    chat.add_argument(
+        "--slow", type=int, default=10, help="slow consumers to add"
+    )
+    chat.add_argument(
+        "--slow-delay",
+        type=float,
+        default=0.1,
+        help="seconds a slow consumer takes per frame",
+    )
+    chat.add_argument(
+        "--memory-sample",
+        type=int,
+        default=200,
+        help="connections opened under tracemalloc, 0 to skip",
+    )
+    chat.add_argument(
+        "--settle",
+        type=float,
+        default=10.0,
+        help="seconds to wait for the fan-out after the last message",
+    )
+    return parser.parse_args(argv)
+
+
+def configure_environment(args) -> None:
+    # Settings are read at import time, so this runs before anything from
+    # notes is imported.
+    database_url = getattr(args, "database_url", None)
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+    else:
+        # The chat never touches the database, the app still needs one.
+        os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+    if args.redis_url:
+        os.environ["REDIS_URL"] = args.redis_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def seed_options(args) -> dict:
+    return {
+        "users": args.users,
+        "notes_per_user": args.notes_per_user,
+        "categories": args.categories,
+        "categories_per_note": args.categories_per_note,
+        "random_seed": args.random_seed,
+    }
+
+
+def dataset_meta(args) -> dict:
+    from benchmarks.report import environment_meta
+    from notes.core.db import engine
+
+    return environment_meta(
+        dialect=engine.dialect.name,
+        redis="real" if args.redis_url else "memory",
+        requests=args.requests,
+        concurrency=args.concurrency,
+        warmup=args.warmup,
+        **seed_options(args),
+    )
+
+
+async def http_command(args) -> int:
+    from benchmarks.app import running_app, seed_database
+    from benchmarks.endpoints import SCENARIOS, make_actors, run_scenario
+    from benchmarks.report import Report
+
+    names = args.scenario or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        print(f"unknown scenarios: {', '.join(sorted(unknown))}")
+        return 2
+
+    report = Report(meta=dataset_meta(args))
+    async with running_app(memory_redis=not args.redis_url):
+        seeded = await seed_database(**seed_options(args))
+        actors = await make_actors(seeded, args.concurrency)
+        try:
+            for name in names:
+                report.add(
+                    await run_scenario(
+                        name,
+                        SCENARIOS[name],
+                        actors,
+                        requests=args.requests,
+                        concurrency=args.concurrency,
+                        warmup=args.warmup,
+                        random_seed=args.random_seed,
+                    )
+                )
+        finally:
+            for actor in actors:
+                await actor.aclose()
+    return finish(report, args)
+
+
+async def serialization_command(args) -> int:
+    from benchmarks.app import running_app, seed_database
+    from benchmarks.endpoints import make_actors
+    from benchmarks.report import Report
+    from benchmarks.serialization import check_same_output, run_serialization
+
+    report = Report(meta=dataset_meta(args))
+    async with running_app(memory_redis=not args.redis_url):
+        seeded = await seed_database(**seed_options(args))
+        actors = await make_actors(seeded, args.concurrency)
+        try:
+            mismatches = await check_same_output(actors[0])
+            if mismatches:
+                print(f"different output: {', '.join(mismatches)}")
+                return 1
+            for result in await run_serialization(
+                actors, args.requests, args.concurrency, args.warmup
+            ):
+                report.add(result)
+        finally:
+            for actor in actors:
+                await actor.aclose()
+    return finish(report, args)
+
+
+async def chat_command(args) -> int:
+    from benchmarks.app import running_app
+    from benchmarks.chat import ChatOptions, run_chat
+    from benchmarks.report import Report, environment_meta
+
+    options = ChatOptions(
+        clients=args.clients,
+        join_concurrency=args.join_concurrency,
+        history=args.history,
+        messages=args.messages,
+        rate=args.rate,
+        slow=args.slow,
+        slow_delay=args.slow_delay,
+        memory_sample=args.memory_sample,
+        settle=args.settle,
+    )
+    async with running_app(memory_redis=not args.redis_url) as app:
+        outcome = await run_chat(app, options)
+    report = Report(
+        meta=environment_meta(
+            redis="real" if args.redis_url else "memory",
+            **vars(options),
+            **outcome["extra"],
+        )
+    )
+    for result in outcome["results"]:
+        report.add(result)
+    for key, value in outcome["extra"].items():
+        print(f"{key}: {value}")
+    return finish(report, args)
+
+
+def finish(report, args) -> int:
+    from benchmarks.report import Report, compare, format_table
+
+    print(format_table(report))
+    if args.save:
+        report.save(args.save)
+    if args.compare:
+        regressions = compare(
+            report, Report.load(args.compare), args.threshold
+        )
+        for regression in regressions:
+            print(f"regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+COMMANDS = {
+    "http": http_command,
+    "serialization": serialization_command,
+    "chat": chat_command,
+}
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    configure_environment(args)
+    return asyncio.run(COMMANDS[args.command](args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi_users.password import PasswordHelper
+
+from benchmarks.memory_redis import MemoryRedis
+from devtools.explain import prepare
+from devtools.seed import Seeded
+from notes.core.db import engine
+from notes.core.redis import set_redis
+from notes.main import app
+
+BENCH_PASSWORD = "benchmark-password"
+BENCH_EMAIL_DOMAIN = "bench.local"
+BASE_URL = "http://bench"
+
+
+def bench_email(index: int) -> str:
+    return f"user{index}@{BENCH_EMAIL_DOMAIN}"
+
+
+async def seed_database(**seed_options) -> Seeded:
+    """Recreates the schema and seeds users that can log in."""
+    return await prepare(
+        engine,
+        hashed_password=PasswordHelper().hash(BENCH_PASSWORD),
+        email_domain=BENCH_EMAIL_DOMAIN,
+        **seed_options,
+    )
+
+
+@asynccontextmanager
+async def running_app(memory_redis: bool = True):
+    """``notes.main:app`` with its lifespan started.
+
+    With ``memory_redis`` Redis is replaced by an in-process fake, so no
+    server is needed and its latency stays out of the numbers.
+    """
+    if memory_redis:
+        set_redis(MemoryRedis())
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+def client(**kwargs) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url=BASE_URL, **kwargs
+    )
+
+
+async def api_client(email: str) -> httpx.AsyncClient:
+    api = client()
+    response = await api.post(
+        "/auth/jwt/login", data={"username": email, "password": BENCH_PASSWORD}
+    )
+    response.raise_for_status()
+    api.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    return api
+
+
+async def web_client(email: str) -> httpx.AsyncClient:
+    web = client()
+    response = await web.post(
+        "/auth/login-form", data={"email": email, "password": BENCH_PASSWORD}
+    )
+    if response.status_code != 303:
+        raise RuntimeError(f"Web login failed for {email}")
+    return web
@@ -0,0 +1,296 @@
+"""Load test for ``/ws/anon-chat``.
+
+Clients are driven straight through the ASGI interface, no sockets or
+network, so thousands of them fit in one process next to the app.
+"""
+
+import asyncio
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+
+from benchmarks.report import ScenarioResult
+from notes.core.constants import REDIS_CHAT_HISTORY_KEY
+from notes.core.redis import get_redis
+from notes.web.chat import broadcaster, chat_event
+
+CHAT_PATH = "/ws/anon-chat"
+BENCH_PREFIX = "bench"
+
+
+class ChatClient:
+    """One simulated websocket client.
+
+    ``delay`` stalls every frame the server sends, which makes the client a
+    slow consumer from the server's point of view.
+    """
+
+    def __init__(
+        self,
+        app,
+        nickname: str,
+        sent_at: Dict[int, float],
+        delay: float = 0.0,
+    ) -> None:
+        self.app = app
+        self.nickname = nickname
+        self.sent_at = sent_at
+        self.delay = delay
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.accepted = asyncio.Event()
+        self.joined = asyncio.Event()
+        self.closed = False
+        self.history = 0
+        self.latencies: List[float] = []
+        self.task: Optional[asyncio.Task] = None
+
+    def scope(self) -> dict:
+        return {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": CHAT_PATH,
+            "raw_path": CHAT_PATH.encode(),
+            "root_path": "",
+            "query_string": urlencode({"nickname": self.nickname}).encode(),
+            "headers": [],
+            "server": ("bench", 80),
+            "client": ("bench", 0),
+            "subprotocols": [],
+        }
+
+    async def receive(self) -> dict:
+        return await self.inbox.get()
+
+    async def send(self, message: dict) -> None:
+        if message["type"] == "websocket.accept":
+            self.accepted.set()
+        elif message["type"] == "websocket.close":
+            self.closed = True
+            self.accepted.set()
+        elif message["type"] == "websocket.send":
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            self.on_frame(message["text"])
+
+    def on_frame(self, text: str) -> None:
+        received = time.perf_counter()
+        frame = json.loads(text)
+        if frame["type"] == "history":
+            self.history = len(frame["messages"])
+        elif frame["type"] == "system":
+            if frame["text"] == f"{self.nickname} вошёл в чат":
+                self.joined.set()
+        elif frame["type"] == "message":
+            prefix, _, seq = frame["text"].partition(" ")
+            if prefix == BENCH_PREFIX and int(seq) in self.sent_at:
+                self.latencies.append(received - self.sent_at[int(seq)])
+
+    async def connect(self, timeout: float) -> float:
+        """Opens the socket, returns the time until the client saw its own
+        join event, i.e. including the history replay."""
+        started = time.perf_counter()
+        self.inbox.put_nowait({"type": "websocket.connect"})
+        self.task = asyncio.create_task(
+            self.app(self.scope(), self.receive, self.send)
+        )
+        await asyncio.wait_for(self.accepted.wait(), timeout)
+        await asyncio.wait_for(self.joined.wait(), timeout)
+        return time.perf_counter() - started
+
+    def say(self, text: str) -> None:
+        self.inbox.put_nowait({"type": "websocket.receive", "text": text})
+
+    async def close(self, timeout: float) -> None:
+        if self.task is None:
+            return
+        self.inbox.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        try:
+            await asyncio.wait_for(self.task, timeout)
+        except (asyncio.TimeoutError, Exception):
+            self.task.cancel()
+
+
+@dataclass
+class ChatRoom:
+    app: object
+    timeout: float = 10.0
+    sent_at: Dict[int, float] = field(default_factory=dict)
+    clients: List[ChatClient] = field(default_factory=list)
+    join_errors: int = 0
+    next_id: int = 0
+    next_seq: int = 0
+
+    async def open(
+        self, count: int, concurrency: int, delay: float = 0.0
+    ) -> List[float]:
+        """Connects ``count`` clients, returns their join times."""
+        semaphore = asyncio.Semaphore(concurrency)
+        join_times: List[float] = []
+
+        async def join(client: ChatClient) -> None:
+            async with semaphore:
+                try:
+                    join_times.append(await client.connect(self.timeout))
+                except asyncio.TimeoutError:
+                    self.join_errors += 1
+
+        opened = [self.client(delay) for _ in range(count)]
+        await asyncio.gather(*(join(client) for client in opened))
+        return join_times
+
+    def client(self, delay: float = 0.0) -> ChatClient:
+        self.next_id += 1
+        client = ChatClient(
+            self.app, f"bench-{self.next_id}", self.sent_at, delay
+        )
+        self.clients.append(client)
+        return client
+
+    async def close(self, clients: Optional[List[ChatClient]] = None) -> None:
+        clients = self.clients if clients is None else clients
+        await asyncio.gather(*(c.close(self.timeout) for c in clients))
+        closed = set(map(id, clients))
+        self.clients = [c for c in self.clients if id(c) not in closed]
+
+    async def broadcast(
+        self, messages: int, rate: float, settle: float
+    ) -> float:
+        """Sends ``messages`` at ``rate`` per second from the first client
+        and waits up to ``settle`` seconds for the fan-out to finish."""
+        # Stragglers from a previous round no longer count.
+        self.sent_at.clear()
+        for client in self.clients:
+            client.latencies.clear()
+        sender = self.clients[0]
+        started = time.perf_counter()
+        for _ in range(messages):
+            self.next_seq += 1
+            self.sent_at[self.next_seq] = time.perf_counter()
+            sender.say(f"{BENCH_PREFIX} {self.next_seq}")
+            await asyncio.sleep(1 / rate)
+        deadline = time.perf_counter() + settle
+        while time.perf_counter() < deadline:
+            if all(
+                len(c.latencies) >= messages
+                for c in self.clients
+                if not c.delay and not c.closed
+            ):
+                break
+            await asyncio.sleep(0.05)
+        return time.perf_counter() - started
+
+
+def fanout_result(
+    name: str, clients: List[ChatClient], elapsed: float, expected: int
+) -> ScenarioResult:
+    samples = [latency for c in clients for latency in c.latencies]
+    missing = sum(max(expected - len(c.latencies), 0) for c in clients)
+    return ScenarioResult.from_samples(name, samples, missing, elapsed)
+
+
+async def fill_history(messages: int) -> None:
+    redis = await get_redis()
+    await redis.delete(REDIS_CHAT_HISTORY_KEY)
+    if messages:
+        await redis.rpush(
+            REDIS_CHAT_HISTORY_KEY,
+            *(
+                chat_event("message", "history", f"Сообщение {i}")
+                for i in range(messages)
+            ),
+        )
+
+
+async def memory_per_connection(room: ChatRoom, count: int) -> float:
+    """Bytes allocated per open connection, both sides of it included.
+
+    Measured on a separate batch since tracemalloc slows everything down.
+    """
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        await room.open(count, concurrency=count)
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    await room.close(room.clients[-count:])
+    return (after - before) / count
+
+
+@dataclass
+class ChatOptions:
+    clients: int = 1000
+    join_concurrency: int = 100
+    history: int = 50
+    messages: int = 200
+    rate: float = 50.0
+    slow: int = 10
+    slow_delay: float = 0.1
+    memory_sample: int = 200
+    settle: float = 10.0
+
+
+async def run_chat(app, options: ChatOptions) -> Dict[str, object]:
+    """Runs every phase, returns the scenario results and the extra
+    numbers (memory, drops) for the report metadata."""
+    await fill_history(options.history)
+    room = ChatRoom(app)
+    results: List[ScenarioResult] = []
+    extra: Dict[str, object] = {}
+
+    started = time.perf_counter()
+    join_times = await room.open(options.clients, options.join_concurrency)
+    results.append(
+        ScenarioResult.from_samples(
+            "join",
+            join_times,
+            room.join_errors,
+            time.perf_counter() - started,
+        )
+    )
+    extra["history_replayed"] = max(c.history for c in room.clients)
+
+    fast = list(room.clients)
+    elapsed = await room.broadcast(
+        options.messages, options.rate, options.settle
+    )
+    results.append(fanout_result("fanout", fast, elapsed, options.messages))
+
+    if options.slow:
+        before = broadcaster.metrics()
+        first_slow = len(room.clients)
+        await room.open(options.slow, options.join_concurrency)
+        slow = room.clients[first_slow:]
+        # Joined at full speed, slowed down only for the broadcast.
+        for client in slow:
+            client.delay = options.slow_delay
+        elapsed = await room.broadcast(
+            options.messages, options.rate, options.settle
+        )
+        after = broadcaster.metrics()
+        results.append(
+            fanout_result("fanout_with_slow", fast, elapsed, options.messages)
+        )
+        results.append(
+            fanout_result(
+                "fanout_slow_clients", slow, elapsed, options.messages
+            )
+        )
+        extra["slow_messages_dropped"] = (
+            after["messages_dropped"] - before["messages_dropped"]
+        )
+        extra["slow_disconnects"] = (
+            after["slow_disconnects"] - before["slow_disconnects"]
+        )
+        await room.close(slow)
+
+    if options.memory_sample:
+        extra["memory_per_connection_bytes"] = round(
+            await memory_per_connection(room, options.memory_sample)
+        )
+    await room.close()
+    return {"results": results, "extra": extra}
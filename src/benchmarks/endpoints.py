@@ -0,0 +1,141 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Sequence
+
+import httpx
+
+from benchmarks.app import api_client, bench_email, web_client
+from benchmarks.report import ScenarioResult
+from devtools.seed import Seeded
+
+
+@dataclass
+class Actor:
+    """One seeded user with an API and a logged-in web client."""
+
+    api: httpx.AsyncClient
+    web: httpx.AsyncClient
+    note_ids: List[int]
+    category_ids: List[int]
+
+    async def aclose(self) -> None:
+        await self.api.aclose()
+        await self.web.aclose()
+
+
+Call = Callable[[Actor, random.Random], Awaitable[httpx.Response]]
+
+
+async def note_list(actor: Actor, rng: random.Random):
+    return await actor.api.get("/note/")
+
+
+async def note_detail(actor: Actor, rng: random.Random):
+    return await actor.api.get(f"/note/{rng.choice(actor.note_ids)}")
+
+
+async def note_create(actor: Actor, rng: random.Random):
+    return await actor.api.post(
+        "/note/",
+        json={
+            "title": f"Бенчмарк {rng.random()}",
+            "text": "Текст заметки",
+            "category_ids": rng.sample(actor.category_ids, 1),
+        },
+    )
+
+
+async def note_update(actor: Actor, rng: random.Random):
+    return await actor.api.patch(
+        f"/note/{rng.choice(actor.note_ids)}/update",
+        json={"text": f"Обновлено {rng.random()}"},
+    )
+
+
+async def category_list(actor: Actor, rng: random.Random):
+    return await actor.api.get("/category/")
+
+
+async def web_index(actor: Actor, rng: random.Random):
+    return await actor.web.get("/")
+
+
+async def web_notes(actor: Actor, rng: random.Random):
+    return await actor.web.get("/notes/")
+
+
+async def web_note_detail(actor: Actor, rng: random.Random):
+    return await actor.web.get(f"/notes/{rng.choice(actor.note_ids)}")
+
+
+SCENARIOS: Dict[str, Call] = {
+    "note_list": note_list,
+    "note_detail": note_detail,
+    "note_create": note_create,
+    "note_update": note_update,
+    "category_list": category_list,
+    "web_index": web_index,
+    "web_notes": web_notes,
+    "web_note_detail": web_note_detail,
+}
+
+
+async def make_actors(seeded: Seeded, count: int) -> List[Actor]:
+    # User 0 is the admin, benchmark regular users.
+    indexes = range(1, min(count + 1, len(seeded.user_ids)))
+    actors = []
+    for index in indexes:
+        user_id = seeded.user_ids[index]
+        email = bench_email(index)
+        actors.append(
+            Actor(
+                api=await api_client(email),
+                web=await web_client(email),
+                note_ids=seeded.note_ids[user_id],
+                category_ids=seeded.category_ids,
+            )
+        )
+    return actors
+
+
+async def run_scenario(
+    name: str,
+    call: Call,
+    actors: Sequence[Actor],
+    requests: int,
+    concurrency: int,
+    warmup: int = 0,
+    random_seed: int = 0,
+) -> ScenarioResult:
+    samples: List[float] = []
+    errors = 0
+
+    async def drive(count: int, record: bool) -> None:
+        remaining = count
+
+        async def worker(actor: Actor, rng: random.Random) -> None:
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                response = await call(actor, rng)
+                if not record:
+                    continue
+                samples.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        await asyncio.gather(
+            *(
+                worker(actors[i % len(actors)], random.Random(random_seed + i))
+                for i in range(concurrency)
+            )
+        )
+
+    await drive(warmup, record=False)
+    started = time.perf_counter()
+    await drive(requests, record=True)
+    elapsed = time.perf_counter() - started
+    return ScenarioResult.from_samples(name, samples, errors, elapsed)
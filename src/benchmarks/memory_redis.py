@@ -0,0 +1,146 @@
+"""In-process stand-in for the Redis commands the app uses.
+
+Lets the benchmarks run without a Redis server and keeps network noise out
+of the numbers. Only the commands called from ``notes`` are implemented.
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Set
+
+
+class MemoryPubSub:
+    def __init__(self, redis: "MemoryRedis") -> None:
+        self.redis = redis
+        self.channels: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, *channels: str) -> None:
+        for channel in channels:
+            self.channels.add(channel)
+            self.redis.subscribers.setdefault(channel, set()).add(self)
+            self.queue.put_nowait(
+                {"type": "subscribe", "channel": channel, "data": 1}
+            )
+
+    async def unsubscribe(self, *channels: str) -> None:
+        for channel in channels or tuple(self.channels):
+            self.channels.discard(channel)
+            self.redis.subscribers.get(channel, set()).discard(self)
+
+    async def get_message(
+        self, ignore_subscribe_messages: bool = False, timeout: float = 0.0
+    ) -> Optional[dict]:
+        while True:
+            try:
+                message = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            if ignore_subscribe_messages and message["type"] != "message":
+                continue
+            return message
+
+    async def listen(self):
+        while self.channels:
+            yield await self.queue.get()
+
+    async def aclose(self) -> None:
+        await self.unsubscribe()
+
+    close = aclose
+
+
+class MemoryPipeline:
+    def __init__(self, redis: "MemoryRedis") -> None:
+        self.redis = redis
+        self.commands: List[tuple] = []
+
+    async def __aenter__(self) -> "MemoryPipeline":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.commands.clear()
+
+    def __getattr__(self, name: str):
+        command = getattr(self.redis, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        commands, self.commands = self.commands, []
+        return [await command(*a, **kw) for command, a, kw in commands]
+
+
+class MemoryRedis:
+    def __init__(self) -> None:
+        self.values: Dict[str, str] = {}
+        self.lists: Dict[str, List[str]] = {}
+        self.subscribers: Dict[str, Set[MemoryPubSub]] = {}
+
+    @staticmethod
+    def _bounds(length: int, start: int, end: int) -> slice:
+        if start < 0:
+            start += length
+        if end < 0:
+            end += length
+        return slice(max(start, 0), end + 1)
+
+    async def ping(self) -> bool:
+        return True
+
+    async def get(self, key: str) -> Optional[str]:
+        return self.values.get(key)
+
+    async def mget(self, *keys: str) -> List[Optional[str]]:
+        return [self.values.get(key) for key in keys]
+
+    async def set(self, key: str, value, ex=None, px=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = str(value)
+        return True
+
+    async def exists(self, *keys: str) -> int:
+        return sum(key in self.values or key in self.lists for key in keys)
+
+    async def delete(self, *keys: str) -> int:
+        deleted = 0
+        for key in keys:
+            found = self.values.pop(key, None) is not None
+            found = self.lists.pop(key, None) is not None or found
+            deleted += found
+        return deleted
+
+    async def rpush(self, key: str, *values: str) -> int:
+        items = self.lists.setdefault(key, [])
+        items.extend(values)
+        return len(items)
+
+    async def ltrim(self, key: str, start: int, end: int) -> bool:
+        items = self.lists.get(key, [])
+        self.lists[key] = items[self._bounds(len(items), start, end)]
+        return True
+
+    async def lrange(self, key: str, start: int, end: int) -> List[str]:
+        items = self.lists.get(key, [])
+        return items[self._bounds(len(items), start, end)]
+
+    async def publish(self, channel: str, message: str) -> int:
+        subscribers = self.subscribers.get(channel, set())
+        for pubsub in subscribers:
+            pubsub.queue.put_nowait(
+                {"type": "message", "channel": channel, "data": message}
+            )
+        return len(subscribers)
+
+    def pubsub(self) -> MemoryPubSub:
+        return MemoryPubSub(self)
+
+    def pipeline(self, transaction: bool = True) -> MemoryPipeline:
+        return MemoryPipeline(self)
+
+    async def aclose(self) -> None:
+        pass
@@ -0,0 +1,127 @@
+import json
+import platform
+import statistics
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int
+    errors: int
+    elapsed: float
+    p50: float
+    p95: float
+    p99: float
+    mean: float
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    @classmethod
+    def from_samples(
+        cls, name: str, samples: List[float], errors: int, elapsed: float
+    ) -> "ScenarioResult":
+        if len(samples) > 1:
+            cuts = statistics.quantiles(samples, n=100, method="inclusive")
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = samples[0] if samples else 0.0
+        return cls(
+            name=name,
+            requests=len(samples),
+            errors=errors,
+            elapsed=elapsed,
+            p50=p50,
+            p95=p95,
+            p99=p99,
+            mean=statistics.fmean(samples) if samples else 0.0,
+        )
+
+
+@dataclass
+class Report:
+    meta: Dict[str, object] = field(default_factory=dict)
+    scenarios: Dict[str, ScenarioResult] = field(default_factory=dict)
+
+    def add(self, result: ScenarioResult) -> None:
+        self.scenarios[result.name] = result
+
+    def to_dict(self) -> dict:
+        return {
+            "meta": self.meta,
+            "scenarios": {
+                name: {**asdict(result), "throughput": result.throughput}
+                for name, result in self.scenarios.items()
+            },
+        }
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "Report":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        report = cls(meta=data.get("meta", {}))
+        for name, values in data.get("scenarios", {}).items():
+            values.pop("throughput", None)
+            report.add(ScenarioResult(**values))
+        return report
+
+
+def environment_meta(**extra) -> Dict[str, object]:
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        **extra,
+    }
+
+
+def format_table(report: Report) -> str:
+    lines = [
+        f"{'scenario':<28}{'req':>7}{'err':>5}{'req/s':>10}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    ]
+    for result in report.scenarios.values():
+        lines.append(
+            f"{result.name:<28}{result.requests:>7}{result.errors:>5}"
+            f"{result.throughput:>10.1f}{result.p50 * 1000:>10.2f}"
+            f"{result.p95 * 1000:>10.2f}{result.p99 * 1000:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+def compare(current: Report, baseline: Report, threshold: float) -> List[str]:
+    """Regressions of ``current`` against ``baseline``.
+
+    A scenario regresses when its p95 grows or its throughput drops by more
+    than ``threshold`` (0.1 is 10%).
+    """
+    regressions = []
+    for name, result in current.scenarios.items():
+        base: Optional[ScenarioResult] = baseline.scenarios.get(name)
+        if base is None:
+            continue
+        if base.p95 and result.p95 > base.p95 * (1 + threshold):
+            regressions.append(
+                f"{name}: p95 {base.p95 * 1000:.2f} -> "
+                f"{result.p95 * 1000:.2f} ms"
+            )
+        if base.throughput and result.throughput < base.throughput * (
+            1 - threshold
+        ):
+            regressions.append(
+                f"{name}: throughput {base.throughput:.1f} -> "
+                f"{result.throughput:.1f} req/s"
+            )
+        if result.errors > base.errors:
+            regressions.append(
+                f"{name}: errors {base.errors} -> {result.errors}"
+            )
+    return regressions
@@ -0,0 +1,78 @@
+"""Response models against the orjson row path for the list endpoints.
+
+Each scenario runs twice, with FAST_SERIALIZATION off and on, after
+checking that both modes return the same body.
+"""
+
+import json
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+from benchmarks.endpoints import Actor, run_scenario
+from benchmarks.report import ScenarioResult
+from notes.core.config import settings
+from notes.core.constants import NOTES_PAGE_MAX_LIMIT
+
+SERIALIZATION_PATHS: Dict[str, Tuple[str, dict]] = {
+    "note_list": ("/note/", {"limit": NOTES_PAGE_MAX_LIMIT}),
+    "category_list": ("/category/", {}),
+    "category_list_notes": (
+        "/category/",
+        {"include": "notes", "notes_limit": NOTES_PAGE_MAX_LIMIT},
+    ),
+}
+
+
+def path_call(path: str, params: dict):
+    async def call(actor: Actor, rng):
+        return await actor.api.get(path, params=params)
+
+    return call
+
+
+@contextmanager
+def serialization_mode(fast: bool):
+    previous = settings.FAST_SERIALIZATION
+    settings.FAST_SERIALIZATION = fast
+    try:
+        yield
+    finally:
+        settings.FAST_SERIALIZATION = previous
+
+
+async def fetch(actor: Actor, path: str, params: dict, fast: bool) -> bytes:
+    with serialization_mode(fast):
+        response = await actor.api.get(path, params=params)
+    response.raise_for_status()
+    return response.content
+
+
+async def check_same_output(actor: Actor) -> List[str]:
+    """Names of the endpoints whose two modes disagree."""
+    mismatches = []
+    for name, (path, params) in SERIALIZATION_PATHS.items():
+        models = await fetch(actor, path, params, fast=False)
+        fast = await fetch(actor, path, params, fast=True)
+        if json.loads(models) != json.loads(fast):
+            mismatches.append(name)
+    return mismatches
+
+
+async def run_serialization(
+    actors: List[Actor], requests: int, concurrency: int, warmup: int
+) -> List[ScenarioResult]:
+    results = []
+    for name, (path, params) in SERIALIZATION_PATHS.items():
+        for mode, fast in (("models", False), ("fast", True)):
+            with serialization_mode(fast):
+                results.append(
+                    await run_scenario(
+                        f"{name}_{mode}",
+                        path_call(path, params),
+                        actors,
+                        requests=requests,
+                        concurrency=concurrency,
+                        warmup=warmup,
+                    )
+                )
+    return results
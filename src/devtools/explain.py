@@ -0,0 +1,257 @@
+"""Index coverage check for the CRUD queries.
+
+Seeds a scratch database, runs every CRUD read path, EXPLAINs each SELECT
+it issued and reports the ones that fall back to a full table scan.
+
+    python -m devtools.explain sqlite+aiosqlite:////tmp/explain.db
+
+Never point it at a real database, it creates and fills the schema.
+"""
+
+import asyncio
+import re
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy import text as sql_text
+from sqlalchemy.ext.asyncio import (AsyncEngine, AsyncSession,
+                                    create_async_engine)
+
+from devtools.seed import Seeded, seed
+from notes.api.schemas.category import CategoryCreate
+from notes.core.base import Base
+from notes.core.pagination import Cursor
+from notes.db.crud.category import category_crud
+from notes.db.crud.note import note_crud
+from notes.db.models import User
+
+PG_SEQ_SCAN = re.compile(r"Seq Scan on (\w+)")
+SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+ALIAS_SUFFIX = re.compile(r"_\d+$")
+
+# Full scans that are meant to happen, with the reason.
+ALLOWED_SCANS: List[Tuple[re.Pattern, str]] = [
+    (
+        re.compile(r"SELECT .+\sFROM category ORDER BY category\.id", re.S),
+        "category_catalogue loads the whole table into memory, and only "
+        "when its version moved",
+    ),
+]
+
+Statement = Tuple[str, object]
+Check = Callable[[AsyncSession, Seeded], Awaitable[object]]
+
+
+@dataclass
+class ScanReport:
+    check: str
+    statement: str
+    plan: List[str] = field(default_factory=list)
+    tables: List[str] = field(default_factory=list)
+    allowed: Optional[str] = None
+
+
+@contextmanager
+def capture_statements(engine: AsyncEngine):
+    statements: List[Statement] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(
+            ("SELECT", "WITH")
+        ):
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+async def explain(conn, statement: str, parameters) -> List[str]:
+    if conn.dialect.name == "postgresql":
+        result = await conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+        return [row[0] for row in result]
+    result = await conn.exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    )
+    return [row[-1] for row in result]
+
+
+def allowed_reason(statement: str) -> Optional[str]:
+    for pattern, reason in ALLOWED_SCANS:
+        if pattern.fullmatch(statement.strip()):
+            return reason
+    return None
+
+
+def scanned_tables(dialect: str, plan: Sequence[str]) -> List[str]:
+    tables = []
+    for line in plan:
+        if dialect == "postgresql":
+            match = PG_SEQ_SCAN.search(line)
+        else:
+            # "SCAN t USING INDEX" walks an index, only bare SCAN is a
+            # table scan.
+            match = SQLITE_SCAN.match(line) if "USING" not in line else None
+        if match is None:
+            continue
+        table = ALIAS_SUFFIX.sub("", match.group(1))
+        if table in Base.metadata.tables:
+            tables.append(table)
+    return tables
+
+
+async def find_seq_scans(
+    engine: AsyncEngine, check: str, statements: Sequence[Statement]
+) -> List[ScanReport]:
+    reports = []
+    async with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            # Tiny seeded tables are cheaper to scan, make the planner
+            # prefer any usable index so only missing ones show up.
+            await conn.execute(sql_text("SET enable_seqscan = off"))
+        for statement, parameters in statements:
+            plan = await explain(conn, statement, parameters)
+            tables = scanned_tables(conn.dialect.name, plan)
+            if tables:
+                reports.append(
+                    ScanReport(
+                        check,
+                        statement,
+                        plan,
+                        tables,
+                        allowed_reason(statement),
+                    )
+                )
+        await conn.rollback()
+    return reports
+
+
+async def load_user(session: AsyncSession, user_id: int) -> User:
+    return await session.get(User, user_id)
+
+
+async def note_page(session: AsyncSession, seeded: Seeded):
+    user = await load_user(session, seeded.user_ids[-1])
+    page = await note_crud.get_page_filtered(session, user, limit=10)
+    cursor = Cursor.after(page.items[-1])
+    return await note_crud.get_page_filtered(
+        session, user, limit=10, cursor=cursor
+    )
+
+
+async def admin_note_page(session: AsyncSession, seeded: Seeded):
+    admin = await load_user(session, seeded.user_ids[0])
+    return await note_crud.get_page_filtered(session, admin, limit=10)
+
+
+async def category_note_page(session: AsyncSession, seeded: Seeded):
+    user = await load_user(session, seeded.user_ids[-1])
+    return await note_crud.get_page_filtered(
+        session, user, limit=10, category_id=seeded.category_ids[0]
+    )
+
+
+async def note_by_id(session: AsyncSession, seeded: Seeded):
+    user = await load_user(session, seeded.user_ids[-1])
+    page = await note_crud.get_page_filtered(session, user, limit=1)
+    return await note_crud.get_by_id_filtered(
+        page.items[0].id, session=session, user=user
+    )
+
+
+async def note_search(session: AsyncSession, seeded: Seeded):
+    user = await load_user(session, seeded.user_ids[-1])
+    return await note_crud.search("заметки", session, user, 10, 0)
+
+
+async def category_with_count(session: AsyncSession, seeded: Seeded):
+    user = await load_user(session, seeded.user_ids[-1])
+    return await category_crud.get_multi_with_counts(
+        session, user, category_id=seeded.category_ids[0]
+    )
+
+
+async def category_previews(session: AsyncSession, seeded: Seeded):
+    user = await load_user(session, seeded.user_ids[-1])
+    return await category_crud.get_notes_previews(
+        seeded.category_ids, session=session, user=user, limit=5
+    )
+
+
+async def category_duplicate_name(session: AsyncSession, seeded: Seeded):
+    try:
+        await category_crud.create(CategoryCreate(name="seed-0"), session)
+    except HTTPException:
+        pass
+
+
+CHECKS: List[Tuple[str, Check]] = [
+    ("note_page", note_page),
+    ("admin_note_page", admin_note_page),
+    ("category_note_page", category_note_page),
+    ("note_by_id", note_by_id),
+    ("note_search", note_search),
+    ("category_with_count", category_with_count),
+    ("category_previews", category_previews),
+    ("category_duplicate_name", category_duplicate_name),
+]
+
+
+async def check_index_coverage(
+    engine: AsyncEngine, seeded: Seeded
+) -> List[ScanReport]:
+    reports = []
+    for name, check in CHECKS:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            with capture_statements(engine) as statements:
+                await check(session, seeded)
+        reports.extend(await find_seq_scans(engine, name, statements))
+    return reports
+
+
+async def prepare(engine: AsyncEngine, **seed_options) -> Seeded:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        seeded = await seed(session, **seed_options)
+    async with engine.begin() as conn:
+        await conn.execute(sql_text("ANALYZE"))
+    return seeded
+
+
+async def main(url: str) -> int:
+    engine = create_async_engine(url)
+    try:
+        seeded = await prepare(engine)
+        reports = await check_index_coverage(engine, seeded)
+    finally:
+        await engine.dispose()
+    unexpected = [report for report in reports if report.allowed is None]
+    for report in reports:
+        if report.allowed is not None:
+            print(
+                f"[{report.check}] allowed full scan of "
+                f"{', '.join(report.tables)}: {report.allowed}"
+            )
+            continue
+        print(f"[{report.check}] full scan of {', '.join(report.tables)}")
+        print(f"  {report.statement.strip()}")
+        for line in report.plan:
+            print(f"    {line}")
+    print(
+        f"{len(CHECKS)} checks, {len(unexpected)} statements with full scans"
+    )
+    return 1 if unexpected else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m devtools.explain <scratch database url>")
+    sys.exit(asyncio.run(main(sys.argv[1])))
@@ -0,0 +1,54 @@
+"""Pytest plugin that fails a test when a block exceeds its SQL budget.
+
+Enable it from a conftest.py:
+
+    pytest_plugins = ["devtools.pytest_query_budget"]
+
+    async def test_note_list(client, assert_query_budget):
+        with assert_query_budget(5) as recorder:
+            await client.get("/note/")
+        assert recorder.count >= 1
+
+Statements from both the primary and the replica engine are counted, repeats
+of the same statement shape over ``max_repeats`` fail like an N+1 loop.
+"""
+
+from contextlib import contextmanager
+from typing import Optional
+
+import pytest
+
+from notes.core.db import engine, read_engine
+from notes.core.query_budget import (Budget, QueryBudgetExceeded,
+                                     QueryRecorder, current_recorder,
+                                     default_budget, install_recorder)
+
+
+@contextmanager
+def query_budget_block(
+    max_statements: Optional[int] = None, max_repeats: Optional[int] = None
+):
+    install_recorder(engine)
+    if read_engine is not None:
+        install_recorder(read_engine)
+    defaults = default_budget()
+    budget = Budget(
+        defaults.max_statements if max_statements is None else max_statements,
+        defaults.max_repeats if max_repeats is None else max_repeats,
+    )
+    recorder = QueryRecorder(parent=current_recorder.get())
+    token = current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        current_recorder.reset(token)
+    problems = recorder.violations(budget)
+    if problems:
+        raise QueryBudgetExceeded(
+            "Query budget exceeded: " + "; ".join(problems)
+        )
+
+
+@pytest.fixture
+def assert_query_budget():
+    return query_budget_block
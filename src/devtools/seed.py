@@ -0,0 +1,91 @@
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from notes.db.models import Category, Note, User, note_category_association
+
+# Not a valid hash on purpose, seeded users can't log in unless a real one
+# is passed in.
+PLACEHOLDER_PASSWORD_HASH = "!seeded"
+
+
+@dataclass
+class Seeded:
+    user_ids: List[int] = field(default_factory=list)
+    category_ids: List[int] = field(default_factory=list)
+    note_ids: Dict[int, List[int]] = field(default_factory=dict)
+    notes_count: int = 0
+
+
+async def seed(
+    session: AsyncSession,
+    users: int = 20,
+    categories: int = 10,
+    notes_per_user: int = 50,
+    hashed_password: str = PLACEHOLDER_PASSWORD_HASH,
+    email_domain: str = "seed.local",
+    categories_per_note: Sequence[int] = (1, 2),
+    random_seed: int = 0,
+) -> Seeded:
+    """Fills the database, every note gets a number of categories drawn
+    from ``categories_per_note`` (repeat a value to weight it)."""
+    rng = random.Random(random_seed)
+    seeded = Seeded()
+    seeded.user_ids = list(
+        await session.scalars(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [
+                {
+                    "email": f"user{i}@{email_domain}",
+                    "hashed_password": hashed_password,
+                    "is_active": True,
+                    "is_superuser": False,
+                    "is_verified": True,
+                    "is_admin": i == 0,
+                }
+                for i in range(users)
+            ],
+        )
+    )
+    seeded.category_ids = list(
+        await session.scalars(
+            insert(Category).returning(
+                Category.id, sort_by_parameter_order=True
+            ),
+            [{"name": f"seed-{i}"} for i in range(categories)],
+        )
+    )
+
+    for user_id in seeded.user_ids:
+        note_ids = list(
+            await session.scalars(
+                insert(Note).returning(Note.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "title": f"Заметка {i}",
+                        "text": f"Текст заметки {i} пользователя {user_id}",
+                        "user_id": user_id,
+                    }
+                    for i in range(notes_per_user)
+                ],
+            )
+        )
+        links = []
+        for note_id in note_ids:
+            size = min(
+                rng.choice(categories_per_note), len(seeded.category_ids)
+            )
+            links.extend(
+                {"note_id": note_id, "category_id": category_id}
+                for category_id in rng.sample(seeded.category_ids, size)
+            )
+        if links:
+            await session.execute(insert(note_category_association), links)
+        seeded.note_ids[user_id] = note_ids
+        seeded.notes_count += len(note_ids)
+
+    await session.commit()
+    return seeded
@@ -0,0 +1,54 @@
+"""add note and category indexes
+
+Revision ID: 3f1b2c7d9a4e
+Revises: 8c6415c6039c
+Create Date: 2026-10-18 12:40:03.615207
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f1b2c7d9a4e"
+down_revision: Union[str, Sequence[str], None] = "8c6415c6039c"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_note_user_id_created_at_id",
+        "note",
+        ["user_id", "created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_note_created_at_id",
+        "note",
+        ["created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_note_category_association_category_id_note_id",
+        "note_category_association",
+        ["category_id", "note_id"],
+        unique=False,
+    )
+    # Fails if duplicate category names already exist, dedupe them first.
+    op.create_index(
+        op.f("ix_category_name"), "category", ["name"], unique=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_category_name"), table_name="category")
+    op.drop_index(
+        "ix_note_category_association_category_id_note_id",
+        table_name="note_category_association",
+    )
+    op.drop_index("ix_note_created_at_id", table_name="note")
+    op.drop_index("ix_note_user_id_created_at_id", table_name="note")
@@ -0,0 +1,41 @@
+"""add note full text search
+
+Revision ID: 8c6415c6039c
+Revises: 81667a168fa3
+Create Date: 2026-10-18 12:05:12.418205
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8c6415c6039c"
+down_revision: Union[str, Sequence[str], None] = "81667a168fa3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        ALTER TABLE note ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(text, '')), 'B')
+        ) STORED
+        """)
+    op.create_index(
+        "ix_note_search_vector",
+        "note",
+        ["search_vector"],
+        unique=False,
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_note_search_vector", table_name="note")
+    op.drop_column("note", "search_vector")
@@ -1,9 +1,10 @@
-from fastapi_users.password import PasswordHelper
 from sqladmin.authentication import AuthenticationBackend
 from sqlalchemy import select
 from starlette.requests import Request
 
 from notes.core.db import AsyncSessionLocal
+from notes.core.passwords import password_hasher
+from notes.core.user_cache import resolve_user
 from notes.db.models.user import User
 
 
@@ -20,8 +21,10 @@ class AdminAuth(AuthenticationBackend):
         if not user or not user.is_admin:
             return False
 
-        helper = PasswordHelper()
-        if not helper.verify_and_update(password, user.hashed_password):
+        verified, _ = await password_hasher.verify_and_update(
+            password, user.hashed_password
+        )
+        if not verified:
             return False
 
         request.session.update({"user": user.id})
@@ -36,4 +39,4 @@ class AdminAuth(AuthenticationBackend):
         if not user_id:
             return None
         async with AsyncSessionLocal() as session:
-            return await session.get(User, user_id)
+            return await resolve_user(user_id, session)
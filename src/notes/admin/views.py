@@ -1,5 +1,8 @@
 from sqladmin import ModelView
 
+from notes.core.category_cache import category_catalogue
+from notes.core.note_versions import note_versions
+from notes.core.user_cache import user_cache
 from notes.db.models import Category, Note, User
 
 
@@ -8,10 +11,30 @@ class UserAdmin(ModelView, model=User):
     column_searchable_list = [User.email]
     column_sortable_list = [User.id, User.email]
 
+    async def after_model_change(self, data, model, is_created, request):
+        await user_cache.invalidate(model.id)
+
+    async def after_model_delete(self, model, request):
+        await user_cache.invalidate(model.id)
+
 
 class NoteAdmin(ModelView, model=Note):
     column_list = [Note.id, Note.title, Note.user_id, Note.created_at]
 
+    async def after_model_change(self, data, model, is_created, request):
+        await note_versions.bump([model.user_id])
+
+    async def after_model_delete(self, model, request):
+        await note_versions.bump([model.user_id])
+
 
 class CategoryAdmin(ModelView, model=Category):
     column_list = [Category.id, Category.name]
+    column_details_exclude_list = [Category.notes]
+    form_excluded_columns = [Category.notes]
+
+    async def after_model_change(self, data, model, is_created, request):
+        await category_catalogue.invalidate()
+
+    async def after_model_delete(self, model, request):
+        await category_catalogue.invalidate()
@@ -1,14 +1,25 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
 from fastapi.params import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from notes.api.schemas.category import (CategoryCreate, CategoryDB,
-                                        CategoryUpdate)
+                                        CategoryUpdate, CategoryWithNotes)
 from notes.api.schemas.common import ID
-from notes.api.validators import check_category_exist
-from notes.core.db import get_async_session
-from notes.core.user import current_user, is_admin
+from notes.api.validators import check_category_exist, check_cursor
+from notes.core.config import settings
+from notes.core.constants import (CATEGORY_NOTES_PREVIEW_LIMIT,
+                                  NOTES_PAGE_DEFAULT_LIMIT,
+                                  NOTES_PAGE_MAX_LIMIT)
+from notes.core.db import get_async_session, get_read_session
+from notes.core.etag import check_not_modified, make_etag
+from notes.core.note_versions import note_versions
+from notes.core.query_budget import query_budget
+from notes.core.responses import fast_json
+from notes.core.user import current_user, current_user_optional, is_admin
 from notes.db.crud.category import category_crud
+from notes.db.crud.note import note_crud
 
 router = APIRouter()
 
@@ -20,6 +31,7 @@ router = APIRouter()
     dependencies=[Depends(is_admin)],
     status_code=status.HTTP_201_CREATED,
 )
+@query_budget(4)
 async def create_new_category(
     new_category: CategoryCreate,
     session: AsyncSession = Depends(get_async_session),
@@ -27,24 +39,113 @@ async def create_new_category(
     return await category_crud.create(new_category, session)
 
 
+def with_notes(category, notes_count, notes=None) -> CategoryWithNotes:
+    return CategoryWithNotes(
+        **CategoryDB.model_validate(category).model_dump(),
+        notes_count=notes_count,
+        notes=notes,
+    )
+
+
+def check_include_user(include: Optional[str], user):
+    if include == "notes" and user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Для include=notes нужна авторизация",
+        )
+
+
 # GET
-@router.get("/", response_model=list[CategoryDB])
+@router.get("/", response_model=list[CategoryWithNotes])
+@query_budget(5)
 async def get_all_categories(
-    session: AsyncSession = Depends(get_async_session),
+    request: Request,
+    response: Response,
+    include: Optional[Literal["notes"]] = None,
+    notes_limit: int = Query(
+        CATEGORY_NOTES_PREVIEW_LIMIT, ge=1, le=NOTES_PAGE_MAX_LIMIT
+    ),
+    session: AsyncSession = Depends(get_read_session),
+    user=Depends(current_user_optional),
 ):
-    return await category_crud.get_multi(session=session)
+    check_include_user(include, user)
+    stamps = await note_versions.current(user, session)
+    if stamps is not None:
+        viewer = (user.id, user.is_admin) if user is not None else None
+        not_modified = check_not_modified(
+            request,
+            response,
+            make_etag("categories", stamps, viewer, include, notes_limit),
+        )
+        if not_modified is not None:
+            return not_modified
+    if settings.FAST_SERIALIZATION:
+        rows = await category_crud.get_rows_with_counts(
+            session=session, user=user
+        )
+        category_ids = [row["id"] for row in rows]
+    else:
+        categories = await category_crud.get_multi_with_counts(
+            session=session, user=user
+        )
+        category_ids = [category.id for category, _ in categories]
+    previews = {}
+    if include == "notes" and category_ids:
+        previews = await category_crud.get_notes_previews(
+            category_ids, session=session, user=user, limit=notes_limit
+        )
+    if settings.FAST_SERIALIZATION:
+        for row in rows:
+            preview = previews.get(row["id"])
+            row["notes"] = preview.to_dict() if preview else None
+        content = rows
+    else:
+        content = [
+            with_notes(category, notes_count, previews.get(category.id))
+            for category, notes_count in categories
+        ]
+    if settings.FAST_SERIALIZATION:
+        return fast_json(content, response)
+    return content
 
 
-@router.get("/{category_id}", response_model=CategoryDB)
+@router.get("/{category_id}", response_model=CategoryWithNotes)
+@query_budget(5)
 async def get_category_by_id(
     category_id: ID,
-    session: AsyncSession = Depends(get_async_session),
+    include: Optional[Literal["notes"]] = None,
+    limit: int = Query(
+        NOTES_PAGE_DEFAULT_LIMIT, ge=1, le=NOTES_PAGE_MAX_LIMIT
+    ),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
+    user=Depends(current_user_optional),
 ):
-    return await check_category_exist(category_id=category_id, session=session)
+    check_include_user(include, user)
+    categories = await category_crud.get_multi_with_counts(
+        session=session, user=user, category_id=category_id
+    )
+    if not categories:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Категория не найдена!",
+        )
+    category, notes_count = categories[0]
+    notes = None
+    if include == "notes":
+        notes = await note_crud.get_page_filtered(
+            session=session,
+            user=user,
+            limit=limit,
+            cursor=check_cursor(cursor),
+            category_id=category_id,
+        )
+    return with_notes(category, notes_count, notes)
 
 
 # PATCH
 @router.patch("/{category_id}/update", response_model=CategoryDB)
+@query_budget(4)
 async def update_category(
     category_id: ID,
     obj_in: CategoryUpdate,
@@ -59,6 +160,7 @@ async def update_category(
 
 # DELETE
 @router.delete("/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(4)
 async def delete_category(
     category_id: ID,
     session: AsyncSession = Depends(get_async_session),
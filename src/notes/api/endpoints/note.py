@@ -1,11 +1,30 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
 from fastapi.params import Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from notes.api.importer import ImportFormat, decoded_body, import_notes
 from notes.api.schemas.common import ID
-from notes.api.schemas.note import NoteCreate, NoteDB, NoteUpdate
-from notes.api.validators import check_note_exist
-from notes.core.db import get_async_session
+from notes.api.schemas.note import (NoteBatchCreate, NoteBatchDelete,
+                                    NoteBatchResult, NoteBatchUpdate,
+                                    NoteCategoriesAdd, NoteCreate, NoteDB,
+                                    NoteImportResult, NotePage, NoteSearchPage,
+                                    NoteUpdate)
+from notes.api.validators import check_cursor, check_note_exist
+from notes.core.config import settings
+from notes.core.constants import (NOTES_PAGE_DEFAULT_LIMIT,
+                                  NOTES_PAGE_MAX_LIMIT,
+                                  SEARCH_PAGE_DEFAULT_LIMIT,
+                                  SEARCH_PAGE_MAX_LIMIT, TITLE_MAX_LEN)
+from notes.core.db import (get_async_session, get_read_session,
+                           open_read_session)
+from notes.core.etag import check_not_modified, make_etag
+from notes.core.note_versions import note_versions
+from notes.core.query_budget import UNLIMITED, query_budget
+from notes.core.responses import (NDJSON_MEDIA_TYPE, accepts_gzip, fast_json,
+                                  gzip_stream, ndjson_lines)
 from notes.core.user import current_user
 from notes.db.crud.note import note_crud
 
@@ -14,6 +33,7 @@ router = APIRouter()
 
 # POST
 @router.post("/", response_model=NoteDB, status_code=status.HTTP_201_CREATED)
+@query_budget(4)
 async def create_new_note(
     new_note: NoteCreate,
     session: AsyncSession = Depends(get_async_session),
@@ -27,8 +47,77 @@ async def create_new_note(
     )
 
 
+@router.post("/batch", response_model=NoteBatchResult)
+@query_budget(6)
+async def create_notes_batch(
+    batch: NoteBatchCreate,
+    session: AsyncSession = Depends(get_async_session),
+    user=Depends(current_user),
+):
+    results = await note_crud.create_batch(
+        [item.dict() for item in batch.items], user=user, session=session
+    )
+    return NoteBatchResult(results=results)
+
+
+@router.post("/import", response_model=NoteImportResult)
+@query_budget(UNLIMITED, UNLIMITED)
+async def import_notes_upload(
+    request: Request,
+    import_format: Optional[ImportFormat] = Query(None, alias="format"),
+    create_categories: bool = False,
+    session: AsyncSession = Depends(get_async_session),
+    user=Depends(current_user),
+):
+    """Notes from an NDJSON or CSV body, parsed as it is uploaded.
+
+    The format comes from ``format`` or else the Content-Type. Chunks are
+    committed as they fill up, so a broken upload keeps what came before.
+    """
+    if import_format is None:
+        import_format = ImportFormat.from_content_type(
+            request.headers.get("content-type", "")
+        )
+    body = decoded_body(
+        request.stream(), request.headers.get("content-encoding", "")
+    )
+    return await import_notes(
+        body, import_format, session, user, create_categories
+    )
+
+
+@router.post("/{note_id}/categories", response_model=NoteDB)
+@query_budget(6)
+async def add_note_categories(
+    note_id: ID,
+    categories_in: NoteCategoriesAdd,
+    session: AsyncSession = Depends(get_async_session),
+    user=Depends(current_user),
+):
+    note = await check_note_exist(note_id=note_id, session=session, user=user)
+    return await note_crud.add_categories(
+        note, categories_in.category_ids, session=session
+    )
+
+
 # PATCH
+@router.patch("/batch", response_model=NoteBatchResult)
+@query_budget(7)
+async def update_notes_batch(
+    batch: NoteBatchUpdate,
+    session: AsyncSession = Depends(get_async_session),
+    user=Depends(current_user),
+):
+    results = await note_crud.update_batch(
+        [item.dict(exclude_unset=True) for item in batch.items],
+        user=user,
+        session=session,
+    )
+    return NoteBatchResult(results=results)
+
+
 @router.patch("/{note_id}/update", response_model=NoteDB)
+@query_budget(8)
 async def update_note(
     note_id: ID,
     note_in: NoteUpdate,
@@ -46,35 +135,140 @@ async def update_note(
 
 
 # GET
-@router.get("/", response_model=list[NoteDB])
+@router.get("/", response_model=NotePage)
+@query_budget(5)
 async def get_all_notes(
-    session: AsyncSession = Depends(get_async_session),
+    request: Request,
+    response: Response,
+    limit: int = Query(
+        NOTES_PAGE_DEFAULT_LIMIT, ge=1, le=NOTES_PAGE_MAX_LIMIT
+    ),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
     user=Depends(current_user),
 ):
-    return await note_crud.get_multi_filtered(session=session, user=user)
+    cursor = check_cursor(cursor)
+    stamps = await note_versions.current(user, session)
+    if stamps is not None:
+        not_modified = check_not_modified(
+            request,
+            response,
+            make_etag("notes", stamps, user.id, user.is_admin, limit, cursor),
+        )
+        if not_modified is not None:
+            return not_modified
+    if settings.FAST_SERIALIZATION:
+        page = await note_crud.get_page_rows(
+            session=session, user=user, limit=limit, cursor=cursor
+        )
+        content = page.to_dict()
+    else:
+        content = NotePage.model_validate(
+            await note_crud.get_page_filtered(
+                session=session, user=user, limit=limit, cursor=cursor
+            )
+        )
+    if settings.FAST_SERIALIZATION:
+        return fast_json(content, response)
+    return content
+
+
+@router.get("/search", response_model=NoteSearchPage)
+@query_budget(4)
+async def search_notes(
+    q: str = Query(..., min_length=1, max_length=TITLE_MAX_LEN),
+    limit: int = Query(
+        SEARCH_PAGE_DEFAULT_LIMIT, ge=1, le=SEARCH_PAGE_MAX_LIMIT
+    ),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_read_session),
+    user=Depends(current_user),
+):
+    return await note_crud.search(
+        q, session=session, user=user, limit=limit, offset=offset
+    )
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+@query_budget(UNLIMITED, UNLIMITED)
+async def export_notes(request: Request, user=Depends(current_user)):
+    """All notes as NDJSON, one NoteDB object per line, oldest first.
+
+    Gzip-compressed when the client accepts it.
+    """
+
+    async def lines():
+        # Dependency sessions are closed before a streaming body is sent.
+        async with open_read_session(request) as session:
+            async for chunk in note_crud.stream_rows(session, user):
+                yield ndjson_lines(chunk)
+
+    headers = {
+        "Content-Disposition": 'attachment; filename="notes.ndjson"',
+        "Vary": "Accept-Encoding",
+    }
+    body = lines()
+    if accepts_gzip(request):
+        headers["Content-Encoding"] = "gzip"
+        body = gzip_stream(body)
+    return StreamingResponse(
+        body, media_type=NDJSON_MEDIA_TYPE, headers=headers
+    )
 
 
 @router.get("/{note_id}", response_model=NoteDB)
+@query_budget(5)
 async def get_note_by_id(
     note_id: ID,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
+    user=Depends(current_user),
+):
+    stamps = await note_versions.current(user, session)
+    if stamps is not None:
+        not_modified = check_not_modified(
+            request,
+            response,
+            make_etag("note", stamps, user.id, user.is_admin, note_id),
+        )
+        if not_modified is not None:
+            return not_modified
+    return await check_note_exist(note_id=note_id, session=session, user=user)
+
+
+# DELETE
+@router.delete("/batch", response_model=NoteBatchResult)
+@query_budget(4)
+async def delete_notes_batch(
+    batch: NoteBatchDelete,
     session: AsyncSession = Depends(get_async_session),
     user=Depends(current_user),
 ):
-    await check_note_exist(note_id=note_id, session=session, user=user)
-    note = await note_crud.get_by_id_filtered(
-        note_id, session=session, user=user
+    results = await note_crud.delete_batch(
+        batch.ids, user=user, session=session
     )
-    if not note:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Заметка не найдена или доступ запрещен!",
-        )
+    return NoteBatchResult(results=results)
 
-    return note
+
+@router.delete("/{note_id}/categories/{category_id}", response_model=NoteDB)
+@query_budget(6)
+async def remove_note_category(
+    note_id: ID,
+    category_id: ID,
+    session: AsyncSession = Depends(get_async_session),
+    user=Depends(current_user),
+):
+    note = await check_note_exist(note_id=note_id, session=session, user=user)
+    return await note_crud.remove_category(note, category_id, session=session)
 
 
-# DELETE
 @router.delete("/{note_id}/delete", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(4)
 async def delete_note(
     note_id: ID,
     session: AsyncSession = Depends(get_async_session),
@@ -87,5 +281,4 @@ async def delete_note(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Заметка не найдена!"
         )
-    await session.delete(note)
-    await session.commit()
+    await note_crud.delete(note, session)
@@ -0,0 +1,317 @@
+"""Note import from NDJSON or CSV request bodies.
+
+The body is never held in memory: it is split into lines as it arrives
+and valid notes are written NOTES_IMPORT_CHUNK_SIZE at a time, every chunk
+in its own transaction. A bad line is reported and skipped, it does not
+stop the import.
+"""
+
+import csv
+import enum
+import logging
+import zlib
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import orjson
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from notes.api.schemas.note import (NoteImportItem, NoteImportLineError,
+                                    NoteImportResult)
+from notes.core.category_cache import category_catalogue
+from notes.core.constants import (NOTES_IMPORT_CHUNK_SIZE,
+                                  NOTES_IMPORT_MAX_ERRORS,
+                                  NOTES_IMPORT_MAX_LINE_BYTES)
+from notes.core.responses import GZIP_WBITS
+from notes.db.crud.category import category_crud
+from notes.db.crud.note import note_crud
+
+logger = logging.getLogger(__name__)
+
+CSV_MEDIA_TYPES = ("text/csv", "application/csv")
+CSV_CATEGORY_SEPARATOR = ";"
+UTF8_BOM = b"\xef\xbb\xbf"
+# Upper bound for what one compressed chunk may inflate to at once.
+GUNZIP_CHUNK_SIZE = 64 * 1024
+LINE_TOO_LONG = f"Строка длиннее {NOTES_IMPORT_MAX_LINE_BYTES} байт"
+
+# (line number, parsed fields or None, error or None)
+Record = Tuple[int, Optional[dict], Optional[str]]
+
+
+class ImportFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+    @classmethod
+    def from_content_type(cls, content_type: str) -> "ImportFormat":
+        media_type = content_type.partition(";")[0].strip().lower()
+        return cls.CSV if media_type in CSV_MEDIA_TYPES else cls.NDJSON
+
+
+async def decoded_body(
+    chunks: AsyncIterator[bytes], content_encoding: str
+) -> AsyncIterator[bytes]:
+    content_encoding = content_encoding.strip().lower()
+    if content_encoding in ("", "identity"):
+        async for chunk in chunks:
+            yield chunk
+        return
+    if content_encoding != "gzip":
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Неподдерживаемое сжатие: {content_encoding}",
+        )
+    decompressor = zlib.decompressobj(wbits=GZIP_WBITS)
+    try:
+        async for chunk in chunks:
+            while chunk:
+                data = decompressor.decompress(chunk, GUNZIP_CHUNK_SIZE)
+                if data:
+                    yield data
+                chunk = decompressor.unconsumed_tail
+        yield decompressor.flush()
+    except zlib.error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Тело запроса повреждено: некорректный gzip",
+        )
+
+
+async def read_lines(
+    chunks: AsyncIterator[bytes], max_bytes: int = NOTES_IMPORT_MAX_LINE_BYTES
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Numbered lines without the line break.
+
+    Lines longer than ``max_bytes`` are dropped as they arrive and come
+    back as None.
+    """
+    buffer = bytearray()
+    number = 0
+    overflow = False
+    async for chunk in chunks:
+        if number == 0 and not buffer:
+            chunk = chunk.removeprefix(UTF8_BOM)
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            number += 1
+            if overflow or end - start > max_bytes:
+                overflow = False
+                yield number, None
+            else:
+                yield number, bytes(buffer[start:end]).removesuffix(b"\r")
+            start = end + 1
+        del buffer[:start]
+        if len(buffer) > max_bytes:
+            overflow = True
+            buffer.clear()
+    if buffer or overflow:
+        yield number + 1, None if overflow else bytes(buffer)
+
+
+async def ndjson_records(
+    lines: AsyncIterator[Tuple[int, Optional[bytes]]],
+) -> AsyncIterator[Record]:
+    async for number, line in lines:
+        if line is None:
+            yield number, None, LINE_TOO_LONG
+            continue
+        if not line.strip():
+            continue
+        try:
+            value = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield number, None, "Некорректный JSON"
+            continue
+        if not isinstance(value, dict):
+            yield number, None, "Ожидался JSON-объект"
+            continue
+        yield number, value, None
+
+
+async def csv_records(
+    lines: AsyncIterator[Tuple[int, Optional[bytes]]],
+    max_bytes: int = NOTES_IMPORT_MAX_LINE_BYTES,
+) -> AsyncIterator[Record]:
+    """Rows of a CSV with a header naming title, text and categories.
+
+    Categories are names separated by ";". Quoted fields may span lines,
+    the row is then reported at the line it starts on.
+    """
+    header: Optional[List[str]] = None
+    parts: List[str] = []
+    first = size = 0
+    async for number, line in lines:
+        if not parts:
+            first, size = number, 0
+        if line is not None:
+            size += len(line)
+        if line is None or size > max_bytes:
+            parts = []
+            yield first, None, LINE_TOO_LONG
+            continue
+        try:
+            parts.append(line.decode())
+        except UnicodeDecodeError:
+            parts = []
+            yield first, None, "Строка не в кодировке UTF-8"
+            continue
+        row = "\n".join(parts)
+        if row.count('"') % 2:
+            # A quoted field goes on on the next line.
+            continue
+        parts = []
+        if not row.strip():
+            continue
+        try:
+            fields = next(csv.reader([row]))
+        except csv.Error:
+            yield first, None, "Некорректная строка CSV"
+            continue
+
+        if header is None:
+            header = [name.strip().lower() for name in fields]
+            if "title" not in header:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="В заголовке CSV нет колонки title",
+                )
+            continue
+        if len(fields) != len(header):
+            yield first, None, f"Ожидалось колонок: {len(header)}"
+            continue
+        values = dict(zip(header, fields))
+        yield first, {
+            "title": values["title"],
+            "text": values.get("text") or None,
+            "categories": [
+                name.strip()
+                for name in values.get("categories", "").split(
+                    CSV_CATEGORY_SEPARATOR
+                )
+                if name.strip()
+            ],
+        }, None
+    if parts:
+        yield first, None, "Незакрытая кавычка"
+
+
+def validation_detail(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+class NoteImporter:
+    def __init__(
+        self, session: AsyncSession, user, create_categories: bool
+    ) -> None:
+        self.session = session
+        self.user = user
+        self.create_categories = create_categories
+        self.result = NoteImportResult()
+        self.pending: List[Tuple[int, NoteImportItem]] = []
+        # Names looked up once for the whole import.
+        self.category_ids: Dict[str, int] = {}
+        self.unknown_names: Set[str] = set()
+
+    def fail(self, line: int, detail: str) -> None:
+        self.result.failed += 1
+        if len(self.result.errors) < NOTES_IMPORT_MAX_ERRORS:
+            self.result.errors.append(
+                NoteImportLineError(line=line, detail=detail)
+            )
+        else:
+            self.result.errors_truncated = True
+
+    async def run(self, records: AsyncIterator[Record]) -> NoteImportResult:
+        async for line, data, error in records:
+            self.result.records += 1
+            if error is not None:
+                self.fail(line, error)
+                continue
+            try:
+                item = NoteImportItem.model_validate(data)
+            except ValidationError as exc:
+                self.fail(line, validation_detail(exc))
+                continue
+            self.pending.append((line, item))
+            if len(self.pending) >= NOTES_IMPORT_CHUNK_SIZE:
+                await self.flush()
+        await self.flush()
+        # Category errors surface a chunk later than the parse errors.
+        self.result.errors.sort(key=lambda error: error.line)
+        if self.result.categories_created:
+            await category_catalogue.invalidate()
+        logger.info(
+            "Пользователь %s импортировал заметки "
+            "(создано: %d, ошибок: %d, новых категорий: %d)",
+            self.user.id,
+            self.result.imported,
+            self.result.failed,
+            self.result.categories_created,
+        )
+        return self.result
+
+    async def resolve_categories(self, names: Set[str]) -> None:
+        names -= self.category_ids.keys() | self.unknown_names
+        if not names:
+            return
+        ids, created = await category_crud.ids_by_name(
+            names, self.session, create=self.create_categories
+        )
+        self.category_ids.update(ids)
+        self.unknown_names |= names - ids.keys()
+        self.result.categories_created += created
+
+    async def flush(self) -> None:
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        await self.resolve_categories(
+            {name for _, item in pending for name in item.categories}
+        )
+        rows = []
+        for line, item in pending:
+            missing = [
+                name
+                for name in item.categories
+                if name not in self.category_ids
+            ]
+            if missing:
+                self.fail(line, f"Категории не найдены: {missing}")
+                continue
+            rows.append(
+                (
+                    item.title,
+                    item.text,
+                    [self.category_ids[name] for name in item.categories],
+                )
+            )
+        if rows:
+            await note_crud.import_rows(rows, self.user, self.session)
+            self.result.imported += len(rows)
+        logger.info(
+            "Импорт заметок пользователя %s: обработано %d, создано %d",
+            self.user.id,
+            self.result.records,
+            self.result.imported,
+        )
+
+
+async def import_notes(
+    chunks: AsyncIterator[bytes],
+    import_format: ImportFormat,
+    session: AsyncSession,
+    user,
+    create_categories: bool = False,
+) -> NoteImportResult:
+    lines = read_lines(chunks)
+    if import_format == ImportFormat.CSV:
+        records = csv_records(lines)
+    else:
+        records = ndjson_records(lines)
+    return await NoteImporter(session, user, create_categories).run(records)
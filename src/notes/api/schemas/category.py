@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -21,3 +21,27 @@ class CategoryDB(CategoryCreate):
 
 class CategoryUpdate(BaseModel):
     name: Optional[str] = None
+
+
+class CategoryNoteDB(BaseModel):
+    id: int
+    title: str
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class CategoryNotePage(BaseModel):
+    items: List[CategoryNoteDB]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class CategoryWithNotes(CategoryDB):
+    notes_count: int
+    notes: Optional[CategoryNotePage] = None
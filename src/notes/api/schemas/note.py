@@ -1,9 +1,9 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Annotated, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
-from notes.core.constants import TITLE_MAX_LEN
+from notes.core.constants import NOTES_BATCH_MAX_SIZE, TITLE_MAX_LEN
 
 from .category import CategoryDB
 
@@ -27,7 +27,115 @@ class NoteDB(NoteBase):
         from_attributes = True
 
 
+class NotePage(BaseModel):
+    items: List[NoteDB]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+Highlight = Annotated[
+    Optional[str],
+    Field(description="HTML: экранированный текст, совпадения в <mark>"),
+]
+
+
+class NoteSearchHit(BaseModel):
+    note: NoteDB
+    rank: float
+    title_highlight: Highlight = None
+    text_highlight: Highlight = None
+
+    class Config:
+        from_attributes = True
+
+
+class NoteSearchPage(BaseModel):
+    items: List[NoteSearchHit]
+    next_offset: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
 class NoteUpdate(BaseModel):
     title: Optional[str] = Field(None, max_length=TITLE_MAX_LEN)
     text: Optional[str] = None
     category_ids: Optional[list[int]] = None
+
+
+class NoteCategoriesAdd(BaseModel):
+    category_ids: List[int] = Field(..., min_length=1)
+
+
+class NoteBatchUpdateItem(NoteUpdate):
+    id: int
+
+
+class NoteBatchCreate(BaseModel):
+    items: List[NoteCreate] = Field(
+        ..., min_length=1, max_length=NOTES_BATCH_MAX_SIZE
+    )
+
+
+class NoteBatchUpdate(BaseModel):
+    items: List[NoteBatchUpdateItem] = Field(
+        ..., min_length=1, max_length=NOTES_BATCH_MAX_SIZE
+    )
+
+
+class NoteBatchDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=NOTES_BATCH_MAX_SIZE)
+
+
+class NoteBatchItemResult(BaseModel):
+    index: int
+    status: int
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class NoteBatchResult(BaseModel):
+    results: List[NoteBatchItemResult]
+
+    class Config:
+        from_attributes = True
+
+
+CategoryName = Annotated[str, Field(min_length=1, max_length=TITLE_MAX_LEN)]
+
+
+class NoteImportItem(NoteBase):
+    categories: List[CategoryName] = Field(default_factory=list)
+
+    @field_validator("categories", mode="before")
+    @classmethod
+    def category_names(cls, value):
+        """Names, or category objects as GET /note/export writes them."""
+        if value is None:
+            return []
+        if isinstance(value, list):
+            return [
+                item.get("name") if isinstance(item, dict) else item
+                for item in value
+            ]
+        return value
+
+
+class NoteImportLineError(BaseModel):
+    line: int
+    detail: str
+
+
+class NoteImportResult(BaseModel):
+    records: int = 0
+    imported: int = 0
+    failed: int = 0
+    categories_created: int = 0
+    errors: List[NoteImportLineError] = Field(default_factory=list)
+    errors_truncated: bool = False
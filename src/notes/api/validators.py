@@ -1,14 +1,16 @@
 from http import HTTPStatus
+from typing import Optional
 
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from notes.core.pagination import Cursor, decode_cursor
 from notes.db.crud.category import category_crud
 from notes.db.crud.note import note_crud
 
 
 async def check_note_exist(note_id: int, session: AsyncSession, user):
-    note = await note_crud.get(note_id, session)
+    note = await note_crud.get_with_categories(note_id, session)
     if note is None:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail="Заметка не найдена!"
@@ -30,3 +32,14 @@ async def check_category_exist(category_id: int, session: AsyncSession):
             status_code=HTTPStatus.NOT_FOUND, detail="Категория не найдена!"
         )
     return category
+
+
+def check_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST, detail="Некорректный курсор"
+        )
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+from collections import deque
+from enum import Enum
+from typing import Dict, Iterable, Optional, Set
+
+from redis.exceptions import RedisError
+from starlette.websockets import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# "Try Again Later": the server shed a client that could not keep up.
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class SlowConsumerPolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEW = "drop_new"
+    DISCONNECT = "disconnect"
+
+
+class Connection:
+    """A websocket with its own bounded send queue and sender task."""
+
+    def __init__(self, websocket: WebSocket, queue_size: int) -> None:
+        self.websocket = websocket
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.sender: asyncio.Task | None = None
+        # Live traffic kept aside while the connection is held.
+        self.held: deque[str] | None = None
+
+    async def drain(self, broadcaster: "Broadcaster") -> None:
+        try:
+            while True:
+                payload = await self.queue.get()
+                await self.websocket.send_text(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # A dead socket only takes itself down, never the sender of
+            # the message or the other subscribers.
+            logger.info("Не удалось отправить сообщение, сокет отключён")
+            broadcaster.forget(self)
+
+
+class Broadcaster:
+    def __init__(
+        self,
+        queue_size: int,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.DROP_OLDEST,
+    ) -> None:
+        self.queue_size = queue_size
+        self.policy = SlowConsumerPolicy(policy)
+        self.connections: Set[Connection] = set()
+        self.messages_published = 0
+        self.messages_dropped = 0
+        self.slow_disconnects = 0
+
+    def connect(
+        self,
+        websocket: WebSocket,
+        backlog: Iterable[str] = (),
+        hold: bool = False,
+    ) -> Connection:
+        """Register a socket; ``backlog`` is queued before live traffic.
+
+        A held connection keeps live traffic aside until ``release``, so
+        it can subscribe before its backlog is read.
+        """
+        connection = Connection(websocket, self.queue_size)
+        for payload in backlog:
+            self.offer(connection, payload)
+        if hold:
+            # Bounded like the send queue, the oldest frames go first.
+            connection.held = deque(maxlen=self.queue_size)
+        else:
+            connection.sender = asyncio.create_task(connection.drain(self))
+        self.connections.add(connection)
+        return connection
+
+    def release(
+        self,
+        connection: Connection,
+        backlog: Iterable[str] = (),
+        seen: Iterable[str] = (),
+    ) -> None:
+        """Queue ``backlog``, then the held traffic not in ``seen``."""
+        held, connection.held = connection.held or (), None
+        seen = set(seen)
+        for payload in backlog:
+            self.offer(connection, payload)
+        for payload in held:
+            if payload not in seen:
+                self.offer(connection, payload)
+        if connection in self.connections:
+            connection.sender = asyncio.create_task(connection.drain(self))
+
+    def forget(self, connection: Connection) -> None:
+        self.connections.discard(connection)
+
+    async def disconnect(self, connection: Connection) -> None:
+        self.forget(connection)
+        if connection.sender is not None:
+            connection.sender.cancel()
+            try:
+                await connection.sender
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def publish(self, payload: str) -> None:
+        """Fan out an already serialized message without awaiting sockets."""
+        self.messages_published += 1
+        for connection in list(self.connections):
+            self.offer(connection, payload)
+
+    def offer(self, connection: Connection, payload: str) -> None:
+        if connection.held is not None:
+            connection.held.append(payload)
+            return
+        try:
+            connection.queue.put_nowait(payload)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        self.messages_dropped += 1
+        connection.dropped += 1
+        if self.policy is SlowConsumerPolicy.DROP_OLDEST:
+            connection.queue.get_nowait()
+            connection.queue.put_nowait(payload)
+        elif self.policy is SlowConsumerPolicy.DISCONNECT:
+            self.slow_disconnects += 1
+            self.forget(connection)
+            if connection.sender is not None:
+                connection.sender.cancel()
+            asyncio.create_task(self._close_slow(connection))
+
+    async def _close_slow(self, connection: Connection) -> None:
+        logger.warning("Медленный клиент чата отключён")
+        try:
+            await connection.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            pass
+
+    def metrics(self) -> Dict[str, int]:
+        depths = [c.queue.qsize() for c in self.connections]
+        return {
+            "connections": len(depths),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "messages_published": self.messages_published,
+            "messages_dropped": self.messages_dropped,
+            "slow_disconnects": self.slow_disconnects,
+        }
+
+
+class RedisRelay:
+    """Relays a Redis pub/sub channel into the local ``Broadcaster``.
+
+    Every worker runs one relay, so an event published by any process
+    reaches the sockets connected to all of them.
+    """
+
+    def __init__(
+        self,
+        broadcaster: Broadcaster,
+        channel: str,
+        retry_delay: float = 1.0,
+    ) -> None:
+        self.broadcaster = broadcaster
+        self.channel = channel
+        self.retry_delay = retry_delay
+        self.task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self, redis) -> None:
+        async with self._lock:
+            if self.task is not None and not self.task.done():
+                return
+            pubsub = await self._subscribe(redis)
+            self.task = asyncio.create_task(self._listen(redis, pubsub))
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except (asyncio.CancelledError, Exception):
+            pass
+        self.task = None
+
+    async def _subscribe(self, redis):
+        pubsub = redis.pubsub()
+        await pubsub.subscribe(self.channel)
+        # Wait for the confirmation so nothing published right after
+        # start() returns can be missed.
+        while await pubsub.get_message(timeout=self.retry_delay) is None:
+            pass
+        return pubsub
+
+    async def _listen(self, redis, pubsub) -> None:
+        try:
+            while True:
+                try:
+                    if pubsub is None:
+                        pubsub = await self._subscribe(redis)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.broadcaster.publish(message["data"])
+                except (RedisError, OSError):
+                    logger.warning("Потеряно соединение с Redis pub/sub")
+                if pubsub is not None:
+                    await pubsub.aclose()
+                    pubsub = None
+                await asyncio.sleep(self.retry_delay)
+        finally:
+            if pubsub is not None:
+                await pubsub.aclose()
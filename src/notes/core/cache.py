@@ -0,0 +1,70 @@
+import time
+from collections import OrderedDict
+from dataclasses import asdict, fields
+from typing import Any, ClassVar, Generic, Hashable, Optional, TypeVar
+
+from sqlalchemy.orm import make_transient_to_detached
+
+ValueType = TypeVar("ValueType")
+
+
+class TTLCache(Generic[ValueType]):
+    """Small in-process LRU cache whose entries also expire after a TTL."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, ValueType]]" = (
+            OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[ValueType]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(
+        self, key: Hashable, value: ValueType, ttl: Optional[float] = None
+    ) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[ValueType]:
+        item = self._data.pop(key, None)
+        return None if item is None else item[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class ModelSnapshot:
+    """Base of frozen dataclasses that copy the columns of ``model``."""
+
+    model: ClassVar[type]
+
+    @classmethod
+    def from_model(cls, instance: Any):
+        return cls(
+            **{
+                column.name: getattr(instance, column.name)
+                for column in fields(cls)
+            }
+        )
+
+    def to_model(self) -> Any:
+        """Detached instance, session.merge(load=False) takes it as is."""
+        instance = self.model(**asdict(self))
+        make_transient_to_detached(instance)
+        return instance
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from notes.core.cache import ModelSnapshot
+from notes.core.config import settings
+from notes.core.db import AsyncSessionLocal, read_engine
+from notes.core.redis import get_redis
+from notes.db.models import Category
+
+logger = logging.getLogger(__name__)
+
+REDIS_CATEGORY_VERSION_KEY = "category:catalogue:version"
+
+
+@dataclass(frozen=True)
+class CategorySnapshot(ModelSnapshot):
+    model = Category
+
+    id: int
+    name: str
+    created_at: datetime
+    updated_at: datetime
+
+    def to_dict(self) -> dict:
+        """Plain dict in the field order of the CategoryDB schema."""
+        return {
+            "name": self.name,
+            "id": self.id,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class CategoryCatalogue:
+    """All categories, kept in process memory.
+
+    Writers move a version stamp in Redis; readers compare it at most
+    every CATEGORY_CACHE_CHECK_SEC and reload the whole set when it moved.
+    Without Redis the set is simply reloaded on every check.
+    """
+
+    def __init__(self) -> None:
+        self.categories: Optional[Dict[int, CategorySnapshot]] = None
+        self.version: Optional[str] = None
+        self.checked_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def remote_version(self) -> Optional[str]:
+        try:
+            return await (await get_redis()).get(REDIS_CATEGORY_VERSION_KEY)
+        except (RedisError, OSError):
+            logger.warning("Redis недоступен, каталог категорий локальный")
+            return None
+
+    def is_fresh(self) -> bool:
+        return (
+            self.categories is not None
+            and time.monotonic() - self.checked_at
+            < settings.CATEGORY_CACHE_CHECK_SEC
+        )
+
+    async def load(self, session: AsyncSession) -> Dict[int, CategorySnapshot]:
+        # A lagging replica would store an old set under the new version,
+        # so reloads always read the primary.
+        if read_engine is not None and session.bind is read_engine:
+            async with AsyncSessionLocal() as primary:
+                return await self.load(primary)
+        result = await session.execute(select(Category).order_by(Category.id))
+        return {
+            category.id: CategorySnapshot.from_model(category)
+            for category in result.scalars()
+        }
+
+    async def get_all(
+        self, session: AsyncSession, refresh: bool = False
+    ) -> Dict[int, CategorySnapshot]:
+        if not refresh and self.is_fresh():
+            return self.categories
+        async with self.lock:
+            if not refresh and self.is_fresh():
+                return self.categories
+            # Read the version first, a write racing with the load below
+            # then only causes one extra reload.
+            version = await self.remote_version()
+            if (
+                refresh
+                or self.categories is None
+                or version is None
+                or version != self.version
+            ):
+                self.categories = await self.load(session)
+                self.version = version
+                logger.info(
+                    "Каталог категорий загружен (кол-во: %d)",
+                    len(self.categories),
+                )
+            self.checked_at = time.monotonic()
+            return self.categories
+
+    async def invalidate(self) -> None:
+        self.categories = None
+        try:
+            # A time stamp rather than INCR, so a lost key cannot repeat
+            # an old version.
+            await (await get_redis()).set(
+                REDIS_CATEGORY_VERSION_KEY, time.time_ns()
+            )
+        except (RedisError, OSError):
+            logger.warning("Не удалось обновить версию каталога в Redis")
+
+
+category_catalogue = CategoryCatalogue()
@@ -1,3 +1,5 @@
+from typing import Dict, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -7,12 +9,60 @@ class Settings(BaseSettings):
 
     SECRET_WORD: str = "SECRET"
     DATABASE_URL: str
+    DATABASE_REPLICA_URL: Optional[str] = None
+    READ_YOUR_WRITES_SEC: float = 5
     PRODUCTION: bool
 
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SEC: float = 5
+    DB_POOL_RECYCLE_SEC: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_WARMUP: int = 2
+    DB_POOL_SLOW_CHECKOUT_SEC: float = 0.5
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
     ADMIN: str
 
     SECRET_KEY: str
 
+    REDIS_URL: str = "redis://redis:6379/0"
+
+    LOG_LEVEL: str = "INFO"
+    # Per-logger overrides, e.g. {"notes.db.crud": "WARNING"}.
+    LOG_LEVELS: Dict[str, str] = {}
+    LOG_JSON: bool = True
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_DEBUG_SAMPLE_RATE: float = 0.01
+
+    # Note and category lists skip the response models and encode rows
+    # with orjson.
+    FAST_SERIALIZATION: bool = True
+
+    # "off", "warn" (log) or "raise" (hold the response back and fail the
+    # request with a 500, for tests only).
+    QUERY_BUDGET_MODE: str = "off"
+    QUERY_BUDGET_DEFAULT_STATEMENTS: int = 10
+    QUERY_BUDGET_MAX_REPEATS: int = 2
+
+    USER_CACHE_SIZE: int = 1024
+    USER_CACHE_TTL_SEC: float = 30
+    USER_CACHE_USE_REDIS: bool = False
+    USER_CACHE_REDIS_TTL_SEC: int = 300
+    CATEGORY_CACHE_CHECK_SEC: float = 1
+    # Verified bearer tokens kept per worker, 0 turns the cache off.
+    JWT_CACHE_SIZE: int = 10000
+
+    # Argon2/bcrypt run in a pool of "thread" or "process" workers.
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_WAITING: int = 64
+    PASSWORD_HASH_QUEUE_TIMEOUT_SEC: float = 5
+
+    CHAT_SEND_QUEUE_SIZE: int = 100
+    CHAT_SLOW_CONSUMER_POLICY: str = "drop_oldest"
+
     model_config = SettingsConfigDict(env_file=".env", extra="allow")
 
 
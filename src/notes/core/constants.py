@@ -10,6 +10,9 @@ JWT_LIFETIME_SEC = 3600
 REDIS_CHAT_HISTORY_KEY = (
     "chat:history"  # Redis key where chat messages are stored
 )
+REDIS_CHAT_CHANNEL = (
+    "chat:events"  # Pub/sub channel relaying chat events between workers
+)
 HISTORY_LAST_N_MESSAGES = (
     20  # Number of messages loaded for a new user when joining
 )
@@ -19,3 +22,29 @@ HISTORY_MAX_SAVE_LEN = (
 LIST_END = (
     -1
 )  # Index of the last element in the list (always the newest message)
+# Both limits are applied from the end of the list: LTRIM/LRANGE use
+# -HISTORY_MAX_SAVE_LEN and -HISTORY_LAST_N_MESSAGES as the start index.
+
+# Pagination
+NOTES_PAGE_DEFAULT_LIMIT = 20  # Notes per page when the client sends no limit
+NOTES_PAGE_MAX_LIMIT = 100  # Upper bound for the client supplied page size
+
+# Batch API
+NOTES_BATCH_MAX_SIZE = 10000  # Maximum number of notes in one batch request
+CATEGORY_NOTES_PREVIEW_LIMIT = 5  # Notes per category in ?include=notes lists
+
+# Export
+NOTES_EXPORT_CHUNK_SIZE = 1000  # Rows fetched from the cursor at a time
+
+# Import
+NOTES_IMPORT_CHUNK_SIZE = 1000  # Notes written and committed at a time
+NOTES_IMPORT_MAX_LINE_BYTES = 1024 * 1024  # Longer lines are skipped unread
+NOTES_IMPORT_MAX_ERRORS = 100  # Line errors listed in the import result
+
+# Full-text search
+SEARCH_TS_CONFIG = "russian"  # PostgreSQL text search configuration
+SEARCH_PAGE_DEFAULT_LIMIT = 20  # Search hits per page by default
+SEARCH_PAGE_MAX_LIMIT = 100  # Upper bound for the search page size
+SEARCH_HIGHLIGHT_START = "<mark>"  # Inserted before every matched term
+SEARCH_HIGHLIGHT_STOP = "</mark>"  # Inserted after every matched term
+SEARCH_SNIPPET_WORDS = 24  # Approximate length of the text fragment
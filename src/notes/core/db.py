@@ -1,8 +1,33 @@
-from sqlalchemy import Column, DateTime, Integer, func
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import logging
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Optional
+
+import jwt
+from redis.exceptions import RedisError
+from sqlalchemy import Column, DateTime, Integer, event, exc, func, make_url
+from sqlalchemy import text as sql_text
+from sqlalchemy.ext.asyncio import (AsyncEngine, AsyncSession,
+                                    create_async_engine)
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import declarative_base, declared_attr, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.functions import now
+from starlette.requests import Request
 
 from notes.core.config import settings
+from notes.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+@compiles(now, "sqlite")
+def sqlite_now(element, compiler, **kw):
+    # CURRENT_TIMESTAMP has no fractional part and a different text layout
+    # than bound datetimes, which breaks (created_at, id) keyset comparisons.
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
 
 
 class PreBase:
@@ -25,10 +50,97 @@ class PreBase:
 
 Base = declarative_base(cls=PreBase)
 
+
+class PoolStats:
+    """How long callers waited to check out a pooled connection."""
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def observe(self, waited: float) -> None:
+        self.checkouts += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        if waited >= settings.DB_POOL_SLOW_CHECKOUT_SEC:
+            logger.warning("Ожидание соединения из пула заняло %.3f с", waited)
+
+    def snapshot(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg": (
+                self.wait_total / self.checkouts if self.checkouts else 0.0
+            ),
+            "wait_max": self.wait_max,
+        }
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            pool_stats.observe(time.perf_counter() - started)
+
+
+def engine_options(url: str) -> dict:
+    options = {"echo": not settings.PRODUCTION, "future": True}
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (
+        None,
+        "",
+        ":memory:",
+    ):
+        return options
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SEC,
+        pool_recycle=settings.DB_POOL_RECYCLE_SEC,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "server_settings": {
+                "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)
+            },
+        }
+    return options
+
+
 engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=not settings.PRODUCTION,
-    future=True,
+    settings.DATABASE_URL, **engine_options(settings.DATABASE_URL)
+)
+
+if engine.dialect.name == "sqlite":
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        # ON DELETE CASCADE of the association table relies on this.
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+read_engine = (
+    create_async_engine(
+        settings.DATABASE_REPLICA_URL,
+        **engine_options(settings.DATABASE_REPLICA_URL),
+    )
+    if settings.DATABASE_REPLICA_URL
+    else None
 )
 
 AsyncSessionLocal = sessionmaker(
@@ -37,7 +149,146 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+ReadSessionLocal = sessionmaker(
+    bind=read_engine or engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
+# Users that wrote recently keep reading from the primary so they see
+# their own changes despite replication lag.
+REDIS_RECENT_WRITE_KEY = "user:wrote:{}"
+SESSION_WRITE_KEY = "wrote_at"
+
 
 async def get_async_session():
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def session_user_id(scope) -> Optional[int]:
+    return scope.get("session", {}).get("user_id")
+
+
+def request_user_id(scope) -> Optional[int]:
+    """Cookie session user, or the subject of the bearer token.
+
+    The token is not verified, the id only picks the database; a forged
+    one at worst reads from the primary.
+    """
+    user_id = session_user_id(scope)
+    if user_id:
+        return user_id
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return None
+            try:
+                sub = jwt.decode(token, options={"verify_signature": False})
+                return int(sub["sub"])
+            except (jwt.PyJWTError, KeyError, TypeError, ValueError):
+                return None
+    return None
+
+
+async def mark_recent_write(user_id: int) -> None:
+    try:
+        await (await get_redis()).set(
+            REDIS_RECENT_WRITE_KEY.format(user_id),
+            1,
+            px=int(settings.READ_YOUR_WRITES_SEC * 1000),
+        )
+    except (RedisError, OSError):
+        logger.warning("Redis недоступен, отметка о записи не сохранена")
+
+
+async def wrote_recently(request: Request) -> bool:
+    wrote_at = request.scope.get("session", {}).get(SESSION_WRITE_KEY, 0)
+    if time.time() - wrote_at < settings.READ_YOUR_WRITES_SEC:
+        return True
+    user_id = request_user_id(request.scope)
+    if user_id is None:
+        return False
+    try:
+        return bool(
+            await (await get_redis()).exists(
+                REDIS_RECENT_WRITE_KEY.format(user_id)
+            )
+        )
+    except (RedisError, OSError):
+        # Lag is worse than a busier primary.
+        return True
+
+
+@asynccontextmanager
+async def open_read_session(request: Request):
+    """Replica session unless the caller wrote recently or it is down.
+
+    For code that outlives the request dependencies, like a streaming
+    response body.
+    """
+    if read_engine is None or await wrote_recently(request):
+        async with AsyncSessionLocal() as session:
+            yield session
+        return
+
+    session = ReadSessionLocal()
+    try:
+        await session.connection()
+    except (OSError, exc.DBAPIError, exc.TimeoutError):
+        logger.warning("Реплика недоступна, чтение идёт с основной БД")
+        await session.close()
+        session = AsyncSessionLocal()
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+async def get_replica_session(request: Request):
+    async with open_read_session(request) as session:
+        yield session
+
+
+# Without a replica reads share the request's primary session, the one
+# current_user loads the user through, instead of taking a second
+# connection from the same pool.
+get_read_session = (
+    get_replica_session if read_engine is not None else get_async_session
+)
+
+
+class ReadYourWritesMiddleware:
+    """Remembers users whose unsafe requests succeeded."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if (
+                message["type"] == "http.response.start"
+                and message["status"] < 400
+            ):
+                user_id = request_user_id(scope)
+                if user_id is not None:
+                    await mark_recent_write(user_id)
+                # Cookie sessions only, API writes get no Set-Cookie.
+                if session_user_id(scope):
+                    scope["session"][SESSION_WRITE_KEY] = time.time()
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+async def warm_up_pool(engine: AsyncEngine, size: int) -> None:
+    """Open ``size`` connections at once so first requests skip connect."""
+    async with AsyncExitStack() as stack:
+        for _ in range(size):
+            connection = await stack.enter_async_context(engine.connect())
+            await connection.execute(sql_text("SELECT 1"))
@@ -0,0 +1,44 @@
+import hashlib
+import json
+from typing import Optional
+
+from fastapi import Request, Response, status
+from pydantic_core import to_jsonable_python
+
+# Clients may keep the copy but must revalidate it with If-None-Match.
+ETAG_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag over the values a response is rendered from."""
+    payload = json.dumps(
+        parts, default=to_jsonable_python, separators=(",", ":")
+    )
+    return '"' + hashlib.sha256(payload.encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ is ignored.
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in tags
+
+
+def check_not_modified(
+    request: Request, response: Response, etag: str
+) -> Optional[Response]:
+    """Returns a bodiless 304 when the client copy is current.
+
+    Otherwise tags the response that the endpoint is about to return.
+    """
+    headers = {"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+        )
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,143 @@
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+from notes.core.config import settings
+
+# Payload fields that never reach the log output.
+REDACTED_KEYS = frozenset(
+    {"text", "password", "hashed_password", "token", "access_token"}
+)
+REDACTED = "***"
+
+# Attributes every LogRecord has, anything else came in through extra=.
+RECORD_ATTRS = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+_exc_formatter = logging.Formatter()
+
+
+def redact(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key in REDACTED_KEYS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return type(value)(redact(item) for item in value)
+    return value
+
+
+class RedactFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.args, dict):
+            record.args = redact(record.args)
+        elif record.args:
+            record.args = tuple(redact(arg) for arg in record.args)
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRS:
+                record.__dict__[key] = (
+                    REDACTED if key in REDACTED_KEYS else redact(value)
+                )
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """Keeps only a share of DEBUG records, the hot-path events."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        data.update(
+            (key, value)
+            for key, value in record.__dict__.items()
+            if key not in RECORD_ATTRS
+        )
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the event loop: records are dropped when full."""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Args and tracebacks may change or keep frames alive once the
+        # caller moves on, so they are rendered to text here. The layout
+        # is still done in the listener thread.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+def setup_logging() -> None:
+    """Routes all logging through a queue drained by a background thread."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(
+        JsonFormatter()
+        if settings.LOG_JSON
+        else logging.Formatter("%(levelname)s:%(name)s:%(message)s")
+    )
+    handler = DroppingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+    handler.addFilter(SampleFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+    handler.addFilter(RedactFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(settings.LOG_LEVEL)
+    for name, level in settings.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(handler.queue, output)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Flushes the queue, called on shutdown."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,164 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Route label for requests that matched no FastAPI route (static, admin,
+# 404s), keeps the label set bounded.
+UNMATCHED_ROUTE = "__other__"
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status code",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being handled",
+    ["method"],
+)
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds",
+    "SQL statement execution time",
+    ["engine", "operation"],
+)
+DB_STATEMENTS_PER_REQUEST = Histogram(
+    "db_statements_per_request",
+    "SQL statements executed while handling one request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, float("inf")),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds",
+    "Time spent in SQL statements while handling one request",
+    ["route"],
+)
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds",
+    "Redis command latency, pipelines are timed as one command",
+    ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+REDIS_COMMAND_ERRORS = Counter(
+    "redis_command_errors_total",
+    "Redis commands that raised",
+    ["command"],
+)
+
+
+@dataclass
+class RequestDbStats:
+    statements: int = 0
+    duration: float = 0.0
+
+
+request_db_stats: ContextVar[Optional[RequestDbStats]] = ContextVar(
+    "request_db_stats", default=None
+)
+
+
+class SnapshotCollector:
+    """Exposes a dict returned by ``callback`` as metrics on every scrape."""
+
+    def __init__(
+        self,
+        prefix: str,
+        callback: Callable[[], Dict[str, float]],
+        counters: Iterable[str] = (),
+    ) -> None:
+        self.prefix = prefix
+        self.callback = callback
+        self.counters = set(counters)
+
+    def collect(self):
+        for key, value in self.callback().items():
+            name = f"{self.prefix}_{key}"
+            if key in self.counters:
+                yield CounterMetricFamily(name, name, value=value)
+            else:
+                yield GaugeMetricFamily(name, name, value=value)
+
+
+def register_snapshot(
+    prefix: str,
+    callback: Callable[[], Dict[str, float]],
+    counters: Iterable[str] = (),
+) -> None:
+    REGISTRY.register(SnapshotCollector(prefix, callback, counters))
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """Times every statement and exposes pool occupancy for ``engine``."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        context.metrics_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        elapsed = time.perf_counter() - context.metrics_started
+        operation = statement.lstrip().split(None, 1)[0].upper()
+        DB_STATEMENT_DURATION.labels(name, operation).observe(elapsed)
+        stats = request_db_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.duration += elapsed
+
+    pool = sync_engine.pool
+    if hasattr(pool, "checkedout"):
+        register_snapshot(
+            f"db_pool_{name}",
+            lambda: {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+            },
+        )
+
+
+class MetricsMiddleware:
+    """Request latency, in-flight requests and per-request DB usage."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        stats = RequestDbStats()
+        token = request_db_stats.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            request_db_stats.reset(token)
+            route = scope.get("route")
+            route = getattr(route, "path_format", None) or UNMATCHED_ROUTE
+            REQUEST_LATENCY.labels(method, route, status_code).observe(elapsed)
+            DB_STATEMENTS_PER_REQUEST.labels(route).observe(stats.statements)
+            DB_TIME_PER_REQUEST.labels(route).observe(stats.duration)
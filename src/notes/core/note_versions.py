@@ -0,0 +1,73 @@
+import logging
+import time
+from typing import Iterable, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from notes.core.category_cache import REDIS_CATEGORY_VERSION_KEY
+from notes.core.config import settings
+from notes.core.db import read_engine
+from notes.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Per owner id, "all" moves with every write and is what admins see.
+REDIS_NOTES_VERSION_KEY = "notes:version:{}"
+ALL_NOTES = "all"
+
+
+class NoteVersions:
+    """Stamps of the last note write, per owner and over all notes.
+
+    Writers set them to the current time after the commit, so a response
+    can be tagged, and a 304 answered, before any row is read. A lost key
+    comes back as a new stamp and never repeats an old one.
+    """
+
+    async def bump(self, user_ids: Iterable[int]) -> None:
+        stamp = time.time_ns()
+        try:
+            pipe = (await get_redis()).pipeline()
+            for key in {*user_ids, ALL_NOTES}:
+                pipe.set(REDIS_NOTES_VERSION_KEY.format(key), stamp)
+            await pipe.execute()
+        except (RedisError, OSError):
+            logger.warning("Не удалось обновить версию заметок в Redis")
+
+    async def current(self, user, session: AsyncSession) -> Optional[tuple]:
+        """Notes and category stamps behind what ``user`` reads.
+
+        None means the response must not be tagged: Redis is down, or a
+        fresh write may not have reached the replica ``session`` reads
+        from.
+        """
+        keys = [REDIS_CATEGORY_VERSION_KEY]
+        if user is not None:
+            keys.append(
+                REDIS_NOTES_VERSION_KEY.format(
+                    ALL_NOTES if user.is_admin else user.id
+                )
+            )
+        try:
+            redis = await get_redis()
+            stamps = await redis.mget(*keys)
+            missing = [key for key, stamp in zip(keys, stamps) if not stamp]
+            if missing:
+                for key in missing:
+                    await redis.set(key, time.time_ns(), nx=True)
+                stamps = await redis.mget(*keys)
+        except (RedisError, OSError):
+            logger.warning("Redis недоступен, ответ без ETag")
+            return None
+        if (
+            read_engine is not None
+            and session.bind is read_engine
+            and time.time_ns() - max(map(int, stamps))
+            < settings.READ_YOUR_WRITES_SEC * 1e9
+        ):
+            return None
+        return tuple(stamps)
+
+
+note_versions = NoteVersions()
@@ -0,0 +1,77 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Generic, List, Optional, TypeVar
+
+ItemType = TypeVar("ItemType")
+
+NEXT = "n"
+PREV = "p"
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Position in a list ordered by ``(created_at, id)`` descending."""
+
+    created_at: datetime
+    id: int
+    direction: str = NEXT
+
+    @classmethod
+    def after(cls, obj: Any) -> "Cursor":
+        return cls(created_at=obj.created_at, id=obj.id, direction=NEXT)
+
+    @classmethod
+    def before(cls, obj: Any) -> "Cursor":
+        return cls(created_at=obj.created_at, id=obj.id, direction=PREV)
+
+
+@dataclass
+class Page(Generic[ItemType]):
+    items: List[ItemType] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        # Shallow, unlike dataclasses.asdict, the items are reused as is.
+        return {
+            "items": self.items,
+            "next_cursor": self.next_cursor,
+            "prev_cursor": self.prev_cursor,
+        }
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    payload = json.dumps(
+        {
+            "d": cursor.direction,
+            "c": cursor.created_at.isoformat(),
+            "i": cursor.id,
+        },
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        cursor = Cursor(
+            created_at=datetime.fromisoformat(payload["c"]),
+            id=int(payload["i"]),
+            direction=payload["d"],
+        )
+    except (
+        binascii.Error,
+        UnicodeDecodeError,
+        ValueError,
+        KeyError,
+        TypeError,
+    ) as exc:
+        raise ValueError("Malformed cursor") from exc
+    if cursor.direction not in (NEXT, PREV):
+        raise ValueError("Malformed cursor")
+    return cursor
@@ -0,0 +1,175 @@
+"""Password hashing off the event loop.
+
+Argon2 and bcrypt are slow on purpose; run inline, every login stalls
+all other requests and websockets of the worker. Here they run in a pool
+of PASSWORD_HASH_WORKERS threads or processes. A caller waits for a free
+worker at most PASSWORD_HASH_QUEUE_TIMEOUT_SEC and is turned away at once
+when PASSWORD_HASH_MAX_WAITING callers already wait, so a login flood
+ends in quick 503s instead of a frozen loop.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import (Executor, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi_users.password import PasswordHelper
+from prometheus_client import Counter, Histogram
+
+from notes.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HASH = "hash"
+VERIFY = "verify"
+
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "Time a worker spent hashing or verifying one password",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+PASSWORD_HASH_WAIT = Histogram(
+    "password_hash_wait_seconds",
+    "Time spent waiting for a free hashing worker",
+    ["operation"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "Hashing calls turned away, the queue was full or the wait timed out",
+    ["operation", "reason"],
+)
+
+# Module level so process workers build their own.
+password_helper = PasswordHelper()
+
+
+def hash_password(password: str) -> str:
+    return password_helper.hash(password)
+
+
+def verify_password(
+    password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return password_helper.verify_and_update(password, hashed_password)
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        workers: int,
+        max_waiting: int,
+        queue_timeout: float,
+        use_processes: bool = False,
+    ) -> None:
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.use_processes = use_processes
+        # As many slots as workers, so the executor itself never queues.
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.executor: Optional[Executor] = None
+        self.waiting = 0
+        self.in_flight = 0
+
+    def get_executor(self) -> Executor:
+        if self.executor is None:
+            if self.use_processes:
+                self.executor = ProcessPoolExecutor(self.workers)
+            else:
+                self.executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="password-hash"
+                )
+        return self.executor
+
+    def get_slots(self) -> asyncio.Semaphore:
+        # Made in the loop that waits on it, a new loop gets its own.
+        loop = asyncio.get_running_loop()
+        if self.slots is None or self.slots_loop is not loop:
+            self.slots = asyncio.Semaphore(self.workers)
+            self.slots_loop = loop
+        return self.slots
+
+    async def acquire(self, operation: str) -> asyncio.Semaphore:
+        """Takes a worker slot, returns the semaphore to release it to."""
+        if self.waiting >= self.max_waiting:
+            PASSWORD_HASH_REJECTED.labels(operation, "queue_full").inc()
+            raise PasswordHasherBusy()
+        slots = self.get_slots()
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            PASSWORD_HASH_REJECTED.labels(operation, "timeout").inc()
+            logger.warning(
+                "Очередь хеширования паролей переполнена (ожидают: %d)",
+                self.waiting,
+            )
+            raise PasswordHasherBusy()
+        finally:
+            self.waiting -= 1
+        PASSWORD_HASH_WAIT.labels(operation).observe(
+            time.perf_counter() - started
+        )
+        return slots
+
+    async def run(self, operation: str, func: Callable, *args):
+        slots = await self.acquire(operation)
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        self.in_flight += 1
+
+        def done(_) -> None:
+            # Frees the slot when the worker is done, not when a cancelled
+            # caller stops waiting for it.
+            self.in_flight -= 1
+            slots.release()
+            PASSWORD_HASH_DURATION.labels(operation).observe(
+                time.perf_counter() - started
+            )
+
+        try:
+            future = self.get_executor().submit(func, *args)
+        except BaseException:
+            # Nothing was scheduled, so no callback will free the slot.
+            done(None)
+            raise
+        future.add_done_callback(
+            lambda future: loop.call_soon_threadsafe(done, future)
+        )
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self.run(HASH, hash_password, password)
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        return await self.run(
+            VERIFY, verify_password, password, hashed_password
+        )
+
+    def metrics(self) -> Dict[str, float]:
+        return {"waiting": self.waiting, "in_flight": self.in_flight}
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_waiting=settings.PASSWORD_HASH_MAX_WAITING,
+    queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT_SEC,
+    use_processes=settings.PASSWORD_HASH_EXECUTOR == "process",
+)
@@ -0,0 +1,187 @@
+import logging
+import re
+import sys
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from notes.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Statement shapes: bound parameters and expanded IN lists collapse, so an
+# N+1 loop shows up as one shape repeated N times.
+NUMBERED_PARAM = re.compile(r"\$\d+|%\(\w+\)s|:\w+")
+PARAM_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+# For streaming endpoints whose statement count grows with the data.
+UNLIMITED = sys.maxsize
+
+
+def statement_shape(statement: str) -> str:
+    shape = NUMBERED_PARAM.sub("?", statement)
+    shape = PARAM_LIST.sub("(?)", shape)
+    return WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@dataclass(frozen=True)
+class Budget:
+    max_statements: int
+    max_repeats: int
+
+
+@dataclass
+class QueryRecorder:
+    statements: List[str] = field(default_factory=list)
+    # An enclosing recorder (a test around a request) sees the statements
+    # too.
+    parent: Optional["QueryRecorder"] = None
+
+    def record(self, statement: str) -> None:
+        recorder = self
+        while recorder is not None:
+            recorder.statements.append(statement)
+            recorder = recorder.parent
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, max_repeats: int) -> List[tuple]:
+        shapes = Counter(statement_shape(s) for s in self.statements)
+        return [
+            (shape, times)
+            for shape, times in shapes.most_common()
+            if times > max_repeats
+        ]
+
+    def violations(self, budget: Budget) -> List[str]:
+        problems = []
+        if self.count > budget.max_statements:
+            problems.append(
+                f"{self.count} statements, budget is {budget.max_statements}"
+            )
+        for shape, times in self.repeated(budget.max_repeats):
+            problems.append(f"{times}x {shape}")
+        return problems
+
+    def check(self, budget: Budget, where: str) -> None:
+        problems = self.violations(budget)
+        if not problems:
+            return
+        message = f"Query budget exceeded in {where}: " + "; ".join(problems)
+        if settings.QUERY_BUDGET_MODE == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+current_recorder: ContextVar[Optional[QueryRecorder]] = ContextVar(
+    "current_recorder", default=None
+)
+
+
+def default_budget() -> Budget:
+    return Budget(
+        settings.QUERY_BUDGET_DEFAULT_STATEMENTS,
+        settings.QUERY_BUDGET_MAX_REPEATS,
+    )
+
+
+def query_budget(
+    max_statements: Optional[int] = None, max_repeats: Optional[int] = None
+):
+    """Declares the SQL budget of an endpoint.
+
+    Put it under the route decorator, it only tags the function.
+    """
+    defaults = default_budget()
+    if max_statements is None:
+        max_statements = defaults.max_statements
+    if max_repeats is None:
+        max_repeats = defaults.max_repeats
+    budget = Budget(max_statements, max_repeats)
+
+    def decorator(endpoint):
+        endpoint.query_budget = budget
+        return endpoint
+
+    return decorator
+
+
+def record_statement(
+    conn, cursor, statement, parameters, context, executemany
+):
+    recorder = current_recorder.get()
+    if recorder is not None:
+        recorder.record(statement)
+
+
+def install_recorder(engine: AsyncEngine) -> None:
+    if not event.contains(
+        engine.sync_engine, "before_cursor_execute", record_statement
+    ):
+        event.listen(
+            engine.sync_engine, "before_cursor_execute", record_statement
+        )
+
+
+class QueryBudgetMiddleware:
+    """Checks every request against its route's budget.
+
+    Adds X-Query-Count to responses. Statements issued after the response
+    started (streaming bodies) are still checked, just not in the header.
+    In raise mode the response is held back until the check passed, so an
+    exceeded budget fails the request with a 500 instead of being noticed
+    after the client got its answer.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        recorder = QueryRecorder(parent=current_recorder.get())
+        token = current_recorder.set(recorder)
+        held = [] if settings.QUERY_BUDGET_MODE == "raise" else None
+
+        def with_count(message):
+            message["headers"] = list(message.get("headers", [])) + [
+                (b"x-query-count", str(recorder.count).encode())
+            ]
+            return message
+
+        async def send_wrapper(message):
+            if held is not None:
+                held.append(message)
+                return
+            if message["type"] == "http.response.start":
+                message = with_count(message)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_recorder.reset(token)
+        route = scope.get("route")
+        if route is not None:
+            budget = getattr(route.endpoint, "query_budget", None)
+            recorder.check(
+                budget or default_budget(),
+                f"{scope['method']} {route.path_format}",
+            )
+        for message in held or ():
+            if message["type"] == "http.response.start":
+                message = with_count(message)
+            await send(message)
@@ -1,13 +1,63 @@
-from redis.asyncio import from_url
+import time
+
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
 
 from notes.core.config import settings
+from notes.core.metrics import REDIS_COMMAND_DURATION, REDIS_COMMAND_ERRORS
 
 _client = None
 
 
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        except Exception:
+            REDIS_COMMAND_ERRORS.labels("PIPELINE").inc()
+            raise
+        finally:
+            REDIS_COMMAND_DURATION.labels("PIPELINE").observe(
+                time.perf_counter() - started
+            )
+
+
+class InstrumentedRedis(Redis):
+    """Redis client that records per-command latency."""
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        except Exception:
+            REDIS_COMMAND_ERRORS.labels(command).inc()
+            raise
+        finally:
+            REDIS_COMMAND_DURATION.labels(command).observe(
+                time.perf_counter() - started
+            )
+
+    def pipeline(self, transaction: bool = True, shard_hint=None):
+        return InstrumentedPipeline(
+            self.connection_pool,
+            self.response_callbacks,
+            transaction,
+            shard_hint,
+        )
+
+
 async def get_redis():
     global _client
     if _client is None:
-        url = getattr(settings, "REDIS_URL", "redis://redis:6379/0")
-        _client = from_url(url, decode_responses=True)
+        _client = InstrumentedRedis.from_url(
+            settings.REDIS_URL, decode_responses=True
+        )
     return _client
+
+
+def set_redis(client) -> None:
+    """Replaces the shared client, e.g. with an in-memory one."""
+    global _client
+    _client = client
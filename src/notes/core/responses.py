@@ -0,0 +1,59 @@
+import zlib
+from typing import AsyncIterator, Iterable
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# zlib window bits that make it write a gzip header and trailer.
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson encoder for plain dicts and lists.
+
+    OPT_UTC_Z writes UTC offsets as "Z", like pydantic does, so the body is
+    the same as the response model would produce.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+def fast_json(content, response: Response) -> FastJSONResponse:
+    """Wraps ``content``, keeping headers set on the injected response.
+
+    FastAPI drops them once the endpoint returns a Response of its own.
+    """
+    fast = FastJSONResponse(content, status_code=response.status_code or 200)
+    fast.raw_headers.extend(
+        (name, value)
+        for name, value in response.raw_headers
+        if name != b"content-length"
+    )
+    return fast
+
+
+def ndjson_lines(items: Iterable) -> bytes:
+    return b"".join(
+        orjson.dumps(item, option=orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE)
+        for item in items
+    )
+
+
+def accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=GZIP_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,108 @@
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import jwt
+from fastapi_users import exceptions
+from fastapi_users.authentication import JWTStrategy
+from fastapi_users.jwt import decode_jwt
+from redis.exceptions import RedisError
+
+from notes.core.cache import TTLCache
+from notes.core.user_cache import UNKNOWN_VERSION, UserSnapshot, user_cache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class VerifiedToken:
+    user: UserSnapshot
+    # Revocation stamp of the user when the token was verified.
+    version: Optional[str]
+
+
+def token_key(token: str) -> str:
+    # Raw tokens are not kept in memory.
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class CachedJWTStrategy(JWTStrategy):
+    """JWT strategy that remembers verified tokens.
+
+    A hit skips decoding and the user lookup, the snapshot is merged into
+    the request session as a detached User without a query. Entries live
+    until their token expires, at most ``cache_size`` of them. Every hit
+    compares the user's stamp in Redis, which user_cache.invalidate bumps,
+    so deactivation or a role change applies on the next request. Without
+    Redis nothing is cached.
+    """
+
+    def __init__(self, *args, cache_size: int, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.tokens: TTLCache[VerifiedToken] = TTLCache(
+            maxsize=cache_size, ttl=self.lifetime_seconds or 0
+        )
+        self.hits = 0
+        self.misses = 0
+
+    async def read_token(self, token: Optional[str], user_manager):
+        if token is None:
+            return None
+        key = token_key(token)
+        cached = self.tokens.get(key)
+        if cached is not None:
+            try:
+                fresh = (
+                    await user_cache.version(cached.user.id) == cached.version
+                )
+            except (RedisError, OSError):
+                fresh = False
+            if fresh:
+                self.hits += 1
+                return await user_manager.user_db.from_snapshot(cached.user)
+            self.tokens.pop(key)
+        self.misses += 1
+
+        try:
+            data = decode_jwt(
+                token,
+                self.decode_key,
+                self.token_audience,
+                algorithms=[self.algorithm],
+            )
+        except jwt.PyJWTError:
+            return None
+        if data.get("sub") is None:
+            return None
+        try:
+            user_id = user_manager.parse_id(data["sub"])
+        except exceptions.InvalidID:
+            return None
+        # Read before the user, a change racing with the load below then
+        # only costs one more miss.
+        version = await user_cache.current_version(user_id)
+        cacheable = version is not UNKNOWN_VERSION
+        user = await user_manager.user_db.get_fresh(user_id, version)
+        # Gives the connection back before the endpoint reads through a
+        # replica session, expire_on_commit=False keeps the user loaded.
+        await user_manager.user_db.session.commit()
+        if user is None:
+            return None
+
+        ttl = data.get("exp", 0) - time.time()
+        if cacheable and ttl > 0:
+            self.tokens.set(
+                key,
+                VerifiedToken(UserSnapshot.from_model(user), version),
+                ttl=ttl,
+            )
+        return user
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.tokens),
+        }
@@ -1,31 +1,40 @@
-from typing import Union
+from typing import Any, Optional, Union
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users import (BaseUserManager, FastAPIUsers, IntegerIDMixin,
-                           InvalidPasswordException)
+                           InvalidPasswordException, exceptions)
 from fastapi_users.authentication import (AuthenticationBackend,
                                           BearerTransport, JWTStrategy)
-from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from notes.api.schemas.user import UserCreate
 from notes.core.config import settings
 from notes.core.constants import JWT_LIFETIME_SEC, MIN_PASSWORD_LEN
 from notes.core.db import get_async_session
+from notes.core.passwords import password_hasher
+from notes.core.token_cache import CachedJWTStrategy
+from notes.core.user_cache import CachedUserDatabase
 from notes.db.models import User
 
 
 async def get_user_db(session: AsyncSession = Depends(get_async_session)):
-    yield SQLAlchemyUserDatabase(session, User)
+    yield CachedUserDatabase(session, User)
 
 
 bearer_transport = BearerTransport(tokenUrl="auth/jwt/login")
 
 
+# One instance for all requests, it holds the verified token cache.
+jwt_strategy = CachedJWTStrategy(
+    secret=settings.SECRET_WORD,
+    lifetime_seconds=JWT_LIFETIME_SEC,
+    cache_size=settings.JWT_CACHE_SIZE,
+)
+
+
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(
-        secret=settings.SECRET_WORD, lifetime_seconds=JWT_LIFETIME_SEC
-    )
+    return jwt_strategy
 
 
 auth_backend = AuthenticationBackend(
@@ -47,6 +56,70 @@ class UserManager(IntegerIDMixin, BaseUserManager):
                 reason="Пароль не должен содержать вашего email-а"
             )
 
+    # The methods below are the library ones with the password hashing
+    # moved to password_hasher, off the event loop.
+
+    async def create(
+        self,
+        user_create: UserCreate,
+        safe: bool = False,
+        request: Optional[Request] = None,
+    ) -> User:
+        await self.validate_password(user_create.password, user_create)
+
+        existing_user = await self.user_db.get_by_email(user_create.email)
+        if existing_user is not None:
+            raise exceptions.UserAlreadyExists()
+
+        user_dict = (
+            user_create.create_update_dict()
+            if safe
+            else user_create.create_update_dict_superuser()
+        )
+        password = user_dict.pop("password")
+        user_dict["hashed_password"] = await password_hasher.hash(password)
+
+        created_user = await self.user_db.create(user_dict)
+        await self.on_after_register(created_user, request)
+        return created_user
+
+    async def authenticate(
+        self, credentials: OAuth2PasswordRequestForm
+    ) -> Optional[User]:
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Hash anyway, so unknown emails take as long as wrong passwords.
+            await password_hasher.hash(credentials.password)
+            return None
+
+        verified, updated_password_hash = (
+            await password_hasher.verify_and_update(
+                credentials.password, user.hashed_password
+            )
+        )
+        if not verified:
+            return None
+        if updated_password_hash is not None:
+            await self.user_db.update(
+                user, {"hashed_password": updated_password_hash}
+            )
+        return user
+
+    async def _update(self, user: User, update_dict: dict[str, Any]) -> User:
+        password = update_dict.get("password")
+        if password is not None:
+            await self.validate_password(password, user)
+            update_dict = {
+                field: value
+                for field, value in update_dict.items()
+                if field != "password"
+            }
+            update_dict["hashed_password"] = await password_hasher.hash(
+                password
+            )
+        return await super()._update(user, update_dict)
+
 
 async def get_user_manager(user_db=Depends(get_user_db)):
     yield UserManager(user_db)
@@ -58,6 +131,7 @@ fastapi_users = FastAPIUsers(
 )
 
 current_user = fastapi_users.current_user(active=True)
+current_user_optional = fastapi_users.current_user(active=True, optional=True)
 current_superuser = fastapi_users.current_user(active=True, superuser=True)
 
 
@@ -0,0 +1,211 @@
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import HTTPConnection
+
+from notes.core.cache import ModelSnapshot, TTLCache
+from notes.core.config import settings
+from notes.core.constants import JWT_LIFETIME_SEC
+from notes.core.redis import get_redis
+from notes.db.models import User
+
+logger = logging.getLogger(__name__)
+
+# Per user id and revocation stamp, a snapshot stored under an old stamp
+# is never read again.
+REDIS_USER_KEY = "user:snapshot:{}:{}"
+# Bumped on every invalidation, cached users and verified tokens of the
+# user compare it.
+REDIS_USER_VERSION_KEY = "user:version:{}"
+# Stands for the stamp while Redis is down, nothing is cached under it.
+UNKNOWN_VERSION = object()
+
+
+@dataclass(frozen=True)
+class UserSnapshot(ModelSnapshot):
+    model = User
+
+    id: int
+    email: str
+    is_active: bool
+    is_superuser: bool
+    is_verified: bool
+    is_admin: bool
+    created_at: datetime
+    updated_at: datetime
+    # Only kept in process memory, never written to Redis.
+    hashed_password: Optional[str] = field(default=None, repr=False)
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        del data["hashed_password"]
+        data["created_at"] = self.created_at.isoformat()
+        data["updated_at"] = self.updated_at.isoformat()
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "UserSnapshot":
+        data: Dict[str, Any] = json.loads(raw)
+        data["created_at"] = datetime.fromisoformat(data["created_at"])
+        data["updated_at"] = datetime.fromisoformat(data["updated_at"])
+        return cls(**data)
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    snapshot: UserSnapshot
+    # Revocation stamp of the user read before the snapshot was loaded.
+    version: Optional[str]
+
+
+class UserCache:
+    """Identity cache keyed by user id, optionally shared through Redis.
+
+    Entries are taken under the user's revocation stamp and only served
+    while it is unchanged, so an invalidation by any worker applies on
+    the next lookup everywhere. The caller reads the stamp before the
+    user, a change racing with the load then only costs one more miss.
+    """
+
+    def __init__(self) -> None:
+        self.local: TTLCache[CachedUser] = TTLCache(
+            maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SEC
+        )
+
+    async def get(self, user_id: int, version) -> Optional[UserSnapshot]:
+        if version is UNKNOWN_VERSION:
+            return None
+        cached = self.local.get(user_id)
+        if cached is not None:
+            if cached.version == version:
+                return cached.snapshot
+            self.local.pop(user_id)
+        if not settings.USER_CACHE_USE_REDIS:
+            return None
+        try:
+            raw = await (await get_redis()).get(
+                REDIS_USER_KEY.format(user_id, version)
+            )
+        except (RedisError, OSError):
+            logger.warning("Redis недоступен, пользователь читается из БД")
+            return None
+        if raw is None:
+            return None
+        snapshot = UserSnapshot.from_json(raw)
+        self.local.set(user_id, CachedUser(snapshot, version))
+        return snapshot
+
+    async def set(self, snapshot: UserSnapshot, version) -> None:
+        if version is UNKNOWN_VERSION:
+            return
+        self.local.set(snapshot.id, CachedUser(snapshot, version))
+        if not settings.USER_CACHE_USE_REDIS:
+            return
+        try:
+            await (await get_redis()).set(
+                REDIS_USER_KEY.format(snapshot.id, version),
+                snapshot.to_json(),
+                ex=settings.USER_CACHE_REDIS_TTL_SEC,
+            )
+        except (RedisError, OSError):
+            logger.warning("Redis недоступен, кэш пользователей локальный")
+
+    async def version(self, user_id: int) -> Optional[str]:
+        """Revocation stamp of the user, raises when Redis is down."""
+        return await (await get_redis()).get(
+            REDIS_USER_VERSION_KEY.format(user_id)
+        )
+
+    async def current_version(self, user_id: int):
+        """Revocation stamp of the user, UNKNOWN_VERSION without Redis."""
+        try:
+            return await self.version(user_id)
+        except (RedisError, OSError):
+            logger.warning("Redis недоступен, пользователь читается из БД")
+            return UNKNOWN_VERSION
+
+    async def invalidate(self, user_id: int) -> None:
+        self.local.pop(user_id)
+        try:
+            # Never repeats, so a stamp that expired and was set again
+            # cannot match a token or snapshot cached before. Outlives
+            # every token cached without a stamp before this call.
+            await (await get_redis()).set(
+                REDIS_USER_VERSION_KEY.format(user_id),
+                time.time_ns(),
+                ex=JWT_LIFETIME_SEC,
+            )
+        except (RedisError, OSError):
+            logger.warning(
+                "Не удалось сбросить кэш пользователя %s в Redis", user_id
+            )
+
+
+user_cache = UserCache()
+
+
+async def resolve_user(
+    user_id: int, session: AsyncSession
+) -> Optional[UserSnapshot]:
+    version = await user_cache.current_version(user_id)
+    snapshot = await user_cache.get(user_id, version)
+    if snapshot is not None:
+        return snapshot
+    user = await session.scalar(select(User).where(User.id == user_id))
+    if user is None:
+        return None
+    snapshot = UserSnapshot.from_model(user)
+    await user_cache.set(snapshot, version)
+    return snapshot
+
+
+async def get_session_user(
+    request: HTTPConnection, session: AsyncSession
+) -> Optional[UserSnapshot]:
+    """User of the web session, resolved at most once per request."""
+    if hasattr(request.state, "session_user"):
+        return request.state.session_user
+    user_id = request.session.get("user_id")
+    user = await resolve_user(user_id, session) if user_id else None
+    request.state.session_user = user
+    return user
+
+
+class CachedUserDatabase(SQLAlchemyUserDatabase):
+    async def get(self, id) -> Optional[User]:
+        version = await user_cache.current_version(id)
+        snapshot = await user_cache.get(id, version)
+        if snapshot is None or snapshot.hashed_password is None:
+            return await self.get_fresh(id, version)
+        return await self.from_snapshot(snapshot)
+
+    async def get_fresh(self, id, version) -> Optional[User]:
+        """Reads the database, caching the user under ``version``.
+
+        The stamp has to be read before this call.
+        """
+        user = await super().get(id)
+        if user is not None:
+            await user_cache.set(UserSnapshot.from_model(user), version)
+        return user
+
+    async def from_snapshot(self, snapshot: UserSnapshot) -> User:
+        return await self.session.merge(snapshot.to_model(), load=False)
+
+    async def update(self, user: User, update_dict: Dict[str, Any]) -> User:
+        user = await super().update(user, update_dict)
+        await user_cache.invalidate(user.id)
+        return user
+
+    async def delete(self, user: User) -> None:
+        user_id = user.id
+        await super().delete(user)
+        await user_cache.invalidate(user_id)
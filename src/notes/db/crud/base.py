@@ -1,13 +1,11 @@
 import logging
 from typing import Generic, TypeVar
 
-from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import delete, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 ModelType = TypeVar("ModelType")
 
@@ -19,63 +17,69 @@ class CRUDBase(Generic[ModelType]):
     async def get(
         self, obj_id: int, session: AsyncSession
     ) -> ModelType | None:
-        logger.info("Getting %s with id=%s", self.model.__name__, obj_id)
         db_obj = await session.execute(
             select(self.model).where(self.model.id == obj_id)
         )
         result = db_obj.scalars().first()
-        logger.info("Got %s: %s", self.model.__name__, result)
+        logger.debug(
+            "Got %s with id=%s (found: %s)",
+            self.model.__name__,
+            obj_id,
+            result is not None,
+        )
         return result
 
     async def get_multi(self, session: AsyncSession) -> list[ModelType]:
-        logger.info("Getting all %s objects", self.model.__name__)
         db_objs = await session.execute(select(self.model))
         result = db_objs.scalars().all()
-        logger.info("Got %d %s objects", len(result), self.model.__name__)
+        logger.debug("Got %d %s objects", len(result), self.model.__name__)
         return result
 
+    def column_values(self, data: dict) -> dict:
+        columns = self.model.__table__.columns.keys()
+        return {field: data[field] for field in data if field in columns}
+
     async def create(
         self, obj_in: BaseModel, session: AsyncSession
     ) -> ModelType:
         obj_in_data = obj_in.dict()
-        db_obj = self.model(**obj_in_data)
-        session.add(db_obj)
+        # RETURNING brings server defaults back, no refresh round-trip.
+        db_obj = await session.scalar(
+            insert(self.model).values(**obj_in_data).returning(self.model)
+        )
         await session.commit()
-        await session.refresh(db_obj)
         logger.info("Created %s with id=%s", self.model.__name__, db_obj.id)
         return db_obj
 
     async def update(
         self, db_obj: ModelType, obj_in: BaseModel, session: AsyncSession
     ) -> ModelType:
-        logger.info(
-            "Updating %s with id=%s",
-            self.model.__name__,
-            getattr(db_obj, "id", None),
+        update_data = self.column_values(obj_in.dict(exclude_unset=True))
+        if not update_data:
+            return db_obj
+        db_obj = await session.scalar(
+            update(self.model)
+            .where(self.model.id == db_obj.id)
+            .values(**update_data)
+            .returning(self.model)
+            .execution_options(populate_existing=True)
         )
-        obj_data = jsonable_encoder(db_obj)
-        update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
         await session.commit()
-        await session.refresh(db_obj)
         logger.info(
-            "Updated %s with id=%s",
+            "Updated %s with id=%s, fields: %s",
             self.model.__name__,
             getattr(db_obj, "id", None),
+            sorted(update_data),
         )
         return db_obj
 
     async def delete(
         self, db_obj: ModelType, session: AsyncSession
     ) -> ModelType:
-        logger.info(
-            "Deleting %s with id=%s",
-            self.model.__name__,
-            getattr(db_obj, "id", None),
+        # Dependent association rows go through ON DELETE CASCADE.
+        await session.execute(
+            delete(self.model).where(self.model.id == db_obj.id)
         )
-        await session.delete(db_obj)
         await session.commit()
         logger.info(
             "Deleted %s with id=%s",
@@ -1,24 +1,201 @@
+from typing import Collection, Dict, List, Optional, Sequence, Tuple
+
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import and_, func, insert, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from notes.core.category_cache import category_catalogue
+from notes.core.pagination import Cursor, Page, encode_cursor
 from notes.db.crud.base import CRUDBase
-from notes.db.models import Category
+from notes.db.models import Category, Note, note_category_association
+
+# CategoryDB and CategoryNoteDB fields in the order the schemas serialize
+# them.
+CATEGORY_ROW_COLUMNS = (
+    Category.name,
+    Category.id,
+    Category.created_at,
+    Category.updated_at,
+)
+PREVIEW_ROW_COLUMNS = (Note.id, Note.title, Note.created_at, Note.updated_at)
 
 
 class CRUDCategory(CRUDBase):
+    async def check_name_free(
+        self,
+        name: str,
+        session: AsyncSession,
+        category_id: Optional[int] = None,
+    ) -> None:
+        stmt = select(Category.id).where(Category.name == name)
+        if category_id is not None:
+            stmt = stmt.where(Category.id != category_id)
+        if await session.scalar(stmt.limit(1)) is not None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Категория с именем '{name}' уже существует",
+            )
+
     async def create(self, obj_in, session: AsyncSession):
+        await self.check_name_free(obj_in.name, session)
+        category = await super().create(obj_in, session)
+        await category_catalogue.invalidate()
+        return category
+
+    async def update(self, db_obj, obj_in, session: AsyncSession):
+        if obj_in.name is not None:
+            await self.check_name_free(obj_in.name, session, db_obj.id)
+        category = await super().update(db_obj, obj_in, session)
+        await category_catalogue.invalidate()
+        return category
+
+    async def delete(self, db_obj, session: AsyncSession):
+        category = await super().delete(db_obj, session)
+        await category_catalogue.invalidate()
+        return category
+
+    async def ids_by_name(
+        self,
+        names: Collection[str],
+        session: AsyncSession,
+        create: bool = False,
+    ) -> Tuple[Dict[str, int], int]:
+        """Ids of the named categories and how many of them were created.
+
+        With ``create`` the missing ones are inserted in the current
+        transaction, the caller commits and invalidates the catalogue.
+        """
         result = await session.execute(
-            select(Category).where(Category.name == obj_in.name)
+            select(Category.name, Category.id).where(Category.name.in_(names))
         )
-        existing = result.scalars().first()
-        if existing:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Категория с именем '{obj_in.name}' уже существует",
+        ids = dict(result.all())
+        missing = [name for name in names if name not in ids]
+        if not create or not missing:
+            return ids, 0
+        dialect = session.get_bind().dialect.name
+        if dialect == "postgresql":
+            stmt = postgresql.insert(Category).on_conflict_do_nothing()
+        elif dialect == "sqlite":
+            stmt = sqlite.insert(Category).on_conflict_do_nothing()
+        else:
+            stmt = insert(Category)
+        result = await session.execute(
+            stmt.returning(Category.name, Category.id),
+            [{"name": name} for name in missing],
+        )
+        created = dict(result.all())
+        ids.update(created)
+        # Names a concurrent import created first were skipped above.
+        raced = [name for name in missing if name not in ids]
+        if raced:
+            result = await session.execute(
+                select(Category.name, Category.id).where(
+                    Category.name.in_(raced)
+                )
+            )
+            ids.update(result.all())
+        return ids, len(created)
+
+    def counts_statement(
+        self, *columns, user=None, category_id: Optional[int] = None
+    ):
+        """Categories with the number of their notes the user can see.
+
+        Admins count every note, anonymous callers none.
+        """
+        if user is None:
+            stmt = select(*columns, literal(0).label("notes_count"))
+        else:
+            counted = note_category_association.c.note_id
+            stmt = select(*columns).outerjoin(
+                note_category_association,
+                note_category_association.c.category_id == Category.id,
             )
+            if not user.is_admin:
+                stmt = stmt.outerjoin(
+                    Note,
+                    and_(
+                        Note.id == note_category_association.c.note_id,
+                        Note.user_id == user.id,
+                    ),
+                )
+                counted = Note.id
+            stmt = stmt.add_columns(
+                func.count(counted).label("notes_count")
+            ).group_by(Category.id)
+        stmt = stmt.order_by(Category.id)
+        if category_id is not None:
+            stmt = stmt.where(Category.id == category_id)
+        return stmt
+
+    async def get_multi_with_counts(
+        self,
+        session: AsyncSession,
+        user=None,
+        category_id: Optional[int] = None,
+    ) -> List[Tuple[Category, int]]:
+        result = await session.execute(
+            self.counts_statement(Category, user=user, category_id=category_id)
+        )
+        return [(category, count) for category, count in result.all()]
+
+    async def get_rows_with_counts(
+        self, session: AsyncSession, user=None
+    ) -> List[dict]:
+        """Categories with notes_count as plain dicts, columns only."""
+        result = await session.execute(
+            self.counts_statement(*CATEGORY_ROW_COLUMNS, user=user)
+        )
+        return [row._asdict() for row in result.all()]
+
+    async def get_notes_previews(
+        self,
+        category_ids: Sequence[int],
+        session: AsyncSession,
+        user,
+        limit: int,
+    ) -> Dict[int, Page]:
+        rank = (
+            func.row_number()
+            .over(
+                partition_by=note_category_association.c.category_id,
+                order_by=(Note.created_at.desc(), Note.id.desc()),
+            )
+            .label("rank")
+        )
+        ranked = (
+            select(
+                note_category_association.c.category_id,
+                note_category_association.c.note_id,
+                rank,
+            )
+            .join(Note, Note.id == note_category_association.c.note_id)
+            .where(note_category_association.c.category_id.in_(category_ids))
+        )
+        if not user.is_admin:
+            ranked = ranked.where(Note.user_id == user.id)
+        ranked = ranked.subquery()
+        result = await session.execute(
+            select(ranked.c.category_id, *PREVIEW_ROW_COLUMNS)
+            .join(Note, Note.id == ranked.c.note_id)
+            .where(ranked.c.rank <= limit + 1)
+            .order_by(ranked.c.category_id, ranked.c.rank)
+        )
 
-        return await super().create(obj_in, session)
+        previews = {category_id: Page() for category_id in category_ids}
+        for row in result.all():
+            category_id, note = row.category_id, row._asdict()
+            del note["category_id"]
+            page = previews[category_id]
+            if len(page.items) < limit:
+                page.items.append(note)
+            else:
+                last = page.items[-1]
+                page.next_cursor = encode_cursor(
+                    Cursor(created_at=last["created_at"], id=last["id"])
+                )
+        return previews
 
 
 category_crud = CRUDCategory(Category)
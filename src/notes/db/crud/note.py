@@ -1,149 +1,831 @@
 import logging
-from typing import List, Optional, TypeVar
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import (AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple,
+                    TypeVar)
 
 from fastapi import HTTPException, status
-from sqlalchemy import delete, insert, select
+from sqlalchemy import Select, delete, func, insert, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
+from notes.core.category_cache import CategorySnapshot, category_catalogue
+from notes.core.constants import (NOTES_EXPORT_CHUNK_SIZE,
+                                  NOTES_PAGE_DEFAULT_LIMIT,
+                                  SEARCH_PAGE_DEFAULT_LIMIT)
+from notes.core.note_versions import note_versions
+from notes.core.pagination import PREV, Cursor, Page, encode_cursor
 from notes.db.crud.base import CRUDBase
 from notes.db.models import Category, Note, note_category_association
+from notes.db.search import (SearchHit, SearchPage, render_highlight,
+                             search_statement)
 
 logger = logging.getLogger(__name__)
 
 ModelType = TypeVar("ModelType", bound=Note)
 
+# NoteDB fields in the order the schema serializes them.
+NOTE_ROW_COLUMNS = (
+    Note.title,
+    Note.text,
+    Note.id,
+    Note.created_at,
+    Note.updated_at,
+)
+
+
+@dataclass
+class BatchItemResult:
+    index: int
+    status: int
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
 
 class CRUDNote(CRUDBase[ModelType]):
+    async def get_categories(
+        self, category_ids: List[int], session: AsyncSession
+    ) -> List[Category]:
+        """Loads the categories, 404 if any of the ids does not exist."""
+        category_ids = list(dict.fromkeys(category_ids))
+        result = await session.execute(
+            select(Category).where(Category.id.in_(category_ids))
+        )
+        categories = {category.id: category for category in result.scalars()}
+        missing_ids = set(category_ids) - set(categories)
+        if missing_ids:
+            logger.warning(
+                "Запрос с несуществующими категориями: %s", missing_ids
+            )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Категории не найдены: {sorted(missing_ids)}",
+            )
+        return [categories[category_id] for category_id in category_ids]
+
+    async def category_links(
+        self, note_ids: List[int], session: AsyncSession
+    ) -> Tuple[Dict[int, List[int]], Dict[int, CategorySnapshot]]:
+        """Category ids of every note and a catalogue that has them all."""
+        result = await session.execute(
+            select(
+                note_category_association.c.note_id,
+                note_category_association.c.category_id,
+            )
+            .where(note_category_association.c.note_id.in_(note_ids))
+            .order_by(note_category_association.c.category_id)
+        )
+        links = defaultdict(list)
+        for note_id, category_id in result.all():
+            links[note_id].append(category_id)
+
+        catalogue = await category_catalogue.get_all(session)
+        linked_ids = {
+            category_id for ids in links.values() for category_id in ids
+        }
+        if not linked_ids <= catalogue.keys():
+            # Created by another worker since the catalogue was loaded.
+            catalogue = await category_catalogue.get_all(session, refresh=True)
+        return links, catalogue
+
+    async def attach_categories(
+        self, notes: List[ModelType], session: AsyncSession
+    ) -> None:
+        """Fills note.categories from the association ids and the catalogue.
+
+        Categories are merged into the session as detached instances, so
+        the category table is not read.
+        """
+        if not notes:
+            return
+        links, catalogue = await self.category_links(
+            [note.id for note in notes], session
+        )
+        linked_ids = {
+            category_id for ids in links.values() for category_id in ids
+        }
+        merged = {}
+        for category_id in linked_ids & catalogue.keys():
+            merged[category_id] = await session.merge(
+                catalogue[category_id].to_model(), load=False
+            )
+        for note in notes:
+            set_committed_value(
+                note,
+                "categories",
+                [
+                    merged[category_id]
+                    for category_id in links[note.id]
+                    if category_id in merged
+                ],
+            )
+
     async def create_with_categories(
         self,
         obj_in: dict,
         category_ids: Optional[List[int]],
         session: AsyncSession,
     ) -> ModelType:
-        note = self.model(**obj_in)
-        session.add(note)
-        await session.flush()
-
-        if category_ids:
-            existing_ids = await session.execute(
-                select(Category.id).where(Category.id.in_(category_ids))
-            )
-            existing_ids = set(existing_ids.scalars().all())
-            missing_ids = set(category_ids) - existing_ids
-            if missing_ids:
-                logger.warning(
-                    f"Попытка создать заметку {note.id} с несуществующими категориями: {missing_ids}"
-                )
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Категории не найдены: {sorted(missing_ids)}",
-                )
-
-            stmt = insert(note_category_association).values(
+        categories = (
+            await self.get_categories(category_ids, session)
+            if category_ids
+            else []
+        )
+        note = await session.scalar(
+            insert(self.model).values(**obj_in).returning(self.model)
+        )
+        if categories:
+            await session.execute(
+                insert(note_category_association),
                 [
-                    {"note_id": note.id, "category_id": cat_id}
-                    for cat_id in category_ids
-                ]
+                    {"note_id": note.id, "category_id": category.id}
+                    for category in categories
+                ],
             )
-            await session.execute(stmt)
-
+        set_committed_value(note, "categories", categories)
         await session.commit()
+        await note_versions.bump([note.user_id])
 
         logger.info(
-            f"Заметка {note.id} создана пользователем {note.user_id}, категории: {category_ids or []}"
+            "Заметка %s создана пользователем %s, категории: %s",
+            note.id,
+            note.user_id,
+            [category.id for category in categories],
         )
+        return note
 
-        note_with_categories = await session.execute(
-            select(Note)
-            .options(selectinload(Note.categories))
-            .where(Note.id == note.id)
+    async def get_with_categories(
+        self, note_id: int, session: AsyncSession
+    ) -> Optional[ModelType]:
+        result = await session.execute(
+            select(self.model).where(self.model.id == note_id)
         )
-        return note_with_categories.scalars().first()
+        note = result.scalars().first()
+        if note is not None:
+            await self.attach_categories([note], session)
+        return note
 
-    async def get_multi_filtered(
-        self, session: AsyncSession, user
-    ) -> List[ModelType]:
-        stmt = select(self.model).options(selectinload(self.model.categories))
+    def page_statement(
+        self,
+        stmt: Select,
+        user,
+        limit: int,
+        cursor: Optional[Cursor],
+        category_id: Optional[int],
+    ) -> Select:
+        key = tuple_(self.model.created_at, self.model.id)
         if not user.is_admin:
             stmt = stmt.where(self.model.user_id == user.id)
+        if category_id is not None:
+            stmt = stmt.join(
+                note_category_association,
+                note_category_association.c.note_id == self.model.id,
+            ).where(note_category_association.c.category_id == category_id)
+        if cursor is None:
+            stmt = stmt.order_by(
+                self.model.created_at.desc(), self.model.id.desc()
+            )
+        elif cursor.direction == PREV:
+            stmt = stmt.where(key > (cursor.created_at, cursor.id)).order_by(
+                self.model.created_at.asc(), self.model.id.asc()
+            )
+        else:
+            stmt = stmt.where(key < (cursor.created_at, cursor.id)).order_by(
+                self.model.created_at.desc(), self.model.id.desc()
+            )
+        return stmt.limit(limit + 1)
+
+    @staticmethod
+    def make_page(items: list, limit: int, cursor: Optional[Cursor]) -> Page:
+        """Page over ``limit + 1`` fetched items, notes or rows alike."""
+        backwards = cursor is not None and cursor.direction == PREV
+        has_more = len(items) > limit
+        items = items[:limit]
+        if backwards:
+            items.reverse()
+
+        has_older = (cursor is not None) if backwards else has_more
+        has_newer = has_more if backwards else (cursor is not None)
+        page = Page(items=items)
+        if items and has_older:
+            page.next_cursor = encode_cursor(Cursor.after(items[-1]))
+        if items and has_newer:
+            page.prev_cursor = encode_cursor(Cursor.before(items[0]))
+        return page
+
+    async def get_page_filtered(
+        self,
+        session: AsyncSession,
+        user,
+        limit: int = NOTES_PAGE_DEFAULT_LIMIT,
+        cursor: Optional[Cursor] = None,
+        category_id: Optional[int] = None,
+    ) -> Page[ModelType]:
+        stmt = self.page_statement(
+            select(self.model), user, limit, cursor, category_id
+        )
+        result = await session.execute(stmt)
+        page = self.make_page(list(result.scalars().all()), limit, cursor)
+        await self.attach_categories(page.items, session)
+        logger.debug(
+            "Пользователь %s получил страницу заметок (кол-во: %d)",
+            user.id,
+            len(page.items),
+        )
+        return page
+
+    async def rows_with_categories(
+        self, rows: list, session: AsyncSession
+    ) -> List[dict]:
+        links, catalogue = await self.category_links(
+            [row.id for row in rows], session
+        )
+        return [
+            {
+                **row._asdict(),
+                "categories": [
+                    catalogue[category_id].to_dict()
+                    for category_id in links[row.id]
+                    if category_id in catalogue
+                ],
+            }
+            for row in rows
+        ]
+
+    async def get_page_rows(
+        self,
+        session: AsyncSession,
+        user,
+        limit: int = NOTES_PAGE_DEFAULT_LIMIT,
+        cursor: Optional[Cursor] = None,
+        category_id: Optional[int] = None,
+    ) -> Page[dict]:
+        """Same page as get_page_filtered as plain dicts shaped like NoteDB.
+
+        Reads columns only, nothing goes through the identity map.
+        """
+        stmt = self.page_statement(
+            select(*NOTE_ROW_COLUMNS), user, limit, cursor, category_id
+        )
         result = await session.execute(stmt)
-        notes = result.scalars().all()
+        page = self.make_page(result.all(), limit, cursor)
+        page.items = await self.rows_with_categories(page.items, session)
+        logger.debug(
+            "Пользователь %s получил страницу заметок (кол-во: %d)",
+            user.id,
+            len(page.items),
+        )
+        return page
+
+    async def stream_rows(
+        self,
+        session: AsyncSession,
+        user,
+        chunk_size: int = NOTES_EXPORT_CHUNK_SIZE,
+    ) -> AsyncIterator[List[dict]]:
+        """All notes visible to ``user``, oldest first, in NoteDB-shaped
+        chunks read through a server-side cursor."""
+        stmt = select(*NOTE_ROW_COLUMNS).order_by(
+            self.model.created_at, self.model.id
+        )
+        if not user.is_admin:
+            stmt = stmt.where(self.model.user_id == user.id)
+        result = await session.stream(
+            stmt.execution_options(yield_per=chunk_size)
+        )
+        exported = 0
+        try:
+            async for rows in result.partitions():
+                exported += len(rows)
+                yield await self.rows_with_categories(rows, session)
+        finally:
+            await result.close()
         logger.info(
-            f"Пользователь {user.id} получил список заметок (кол-во: {len(notes)})"
+            "Пользователь %s выгрузил заметки (кол-во: %d)", user.id, exported
+        )
+
+    async def search(
+        self,
+        query: str,
+        session: AsyncSession,
+        user,
+        limit: int = SEARCH_PAGE_DEFAULT_LIMIT,
+        offset: int = 0,
+    ) -> SearchPage:
+        query = query.strip()
+        if not query:
+            # An empty MATCH is a syntax error in FTS5.
+            return SearchPage()
+        criteria = []
+        if not user.is_admin:
+            criteria.append(self.model.user_id == user.id)
+        stmt = search_statement(
+            session.get_bind().dialect.name,
+            self.model,
+            query,
+            *criteria,
+            limit=limit + 1,
+            offset=offset,
+        )
+        rows = (await session.execute(stmt)).all()
+        await self.attach_categories([row[0] for row in rows[:limit]], session)
+        page = SearchPage(
+            items=[
+                SearchHit(
+                    note=note,
+                    rank=rank,
+                    title_highlight=render_highlight(title_highlight),
+                    text_highlight=render_highlight(text_highlight),
+                )
+                for note, rank, title_highlight, text_highlight in rows[:limit]
+            ]
+        )
+        if len(rows) > limit:
+            page.next_offset = offset + limit
+        logger.debug(
+            "Пользователь %s выполнил поиск (найдено: %d)",
+            user.id,
+            len(page.items),
         )
-        return notes
+        return page
 
     async def get_by_id_filtered(
         self, note_id: int, session: AsyncSession, user
     ) -> Optional[ModelType]:
-        stmt = (
-            select(self.model)
-            .where(self.model.id == note_id)
-            .options(selectinload(self.model.categories))
-        )
+        stmt = select(self.model).where(self.model.id == note_id)
         if not user.is_admin:
             stmt = stmt.where(self.model.user_id == user.id)
         result = await session.execute(stmt)
         note = result.scalars().first()
         if note:
-            logger.info(f"Заметка {note.id} получена пользователем {user.id}")
+            await self.attach_categories([note], session)
+            logger.debug(
+                "Заметка %s получена пользователем %s", note.id, user.id
+            )
         else:
             logger.warning(
-                f"Заметка {note_id} не найдена или доступ запрещён (пользователь {user.id})"
+                "Заметка %s не найдена или доступ запрещён (пользователь %s)",
+                note_id,
+                user.id,
             )
         return note
 
-    async def update_with_categories(
-        self, db_obj: ModelType, obj_in: dict, session: AsyncSession
-    ) -> ModelType:
-        for field, value in obj_in.items():
-            if field != "category_ids" and value is not None:
-                setattr(db_obj, field, value)
+    async def set_categories(
+        self, db_obj: ModelType, category_ids: List[int], session: AsyncSession
+    ) -> bool:
+        """Writes only the association rows that differ from the loaded ones.
 
-        if "category_ids" in obj_in and obj_in["category_ids"] is not None:
+        Returns whether anything changed.
+        """
+        current = {category.id: category for category in db_obj.categories}
+        wanted = list(dict.fromkeys(category_ids))
+        added_ids = [
+            category_id for category_id in wanted if category_id not in current
+        ]
+        removed_ids = set(current) - set(wanted)
+        added = (
+            await self.get_categories(added_ids, session) if added_ids else []
+        )
+        if removed_ids:
             await session.execute(
                 delete(note_category_association).where(
-                    note_category_association.c.note_id == db_obj.id
+                    note_category_association.c.note_id == db_obj.id,
+                    note_category_association.c.category_id.in_(removed_ids),
                 )
             )
+        if added:
+            await session.execute(
+                insert(note_category_association),
+                [
+                    {"note_id": db_obj.id, "category_id": category.id}
+                    for category in added
+                ],
+            )
+        current.update((category.id, category) for category in added)
+        set_committed_value(
+            db_obj,
+            "categories",
+            [current[category_id] for category_id in wanted],
+        )
+        return bool(added or removed_ids)
+
+    async def update_columns(
+        self, db_obj: ModelType, values: dict, session: AsyncSession
+    ) -> None:
+        categories = db_obj.categories
+        # populate_existing refreshes db_obj in place from RETURNING.
+        await session.execute(
+            update(self.model)
+            .where(self.model.id == db_obj.id)
+            .values(updated_at=func.now(), **values)
+            .returning(self.model)
+            .execution_options(populate_existing=True)
+        )
+        # populate_existing resets the collection, put the known one back.
+        set_committed_value(db_obj, "categories", categories)
+
+    async def update_with_categories(
+        self, db_obj: ModelType, obj_in: dict, session: AsyncSession
+    ) -> ModelType:
+        """Expects db_obj with categories loaded, as the fetches above do."""
+        values = {
+            field: value
+            for field, value in obj_in.items()
+            if field != "category_ids" and value is not None
+        }
+        categories_changed = False
+        if obj_in.get("category_ids") is not None:
+            categories_changed = await self.set_categories(
+                db_obj, obj_in["category_ids"], session
+            )
+        if values or categories_changed:
+            await self.update_columns(db_obj, values, session)
+        await session.commit()
+        await note_versions.bump([db_obj.user_id])
+
+        logger.info(
+            "Заметка %s обновлена, поля: %s", db_obj.id, sorted(obj_in)
+        )
+        return db_obj
+
+    async def add_categories(
+        self, db_obj: ModelType, category_ids: List[int], session: AsyncSession
+    ) -> ModelType:
+        current_ids = [category.id for category in db_obj.categories]
+        if await self.set_categories(
+            db_obj, current_ids + category_ids, session
+        ):
+            await self.update_columns(db_obj, {}, session)
+            await session.commit()
+            await note_versions.bump([db_obj.user_id])
+        logger.info(
+            "Заметке %s добавлены категории: %s", db_obj.id, category_ids
+        )
+        return db_obj
+
+    async def remove_category(
+        self, db_obj: ModelType, category_id: int, session: AsyncSession
+    ) -> ModelType:
+        current_ids = [category.id for category in db_obj.categories]
+        if category_id not in current_ids:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Категория не привязана к заметке!",
+            )
+        current_ids.remove(category_id)
+        await self.set_categories(db_obj, current_ids, session)
+        await self.update_columns(db_obj, {}, session)
+        await session.commit()
+        await note_versions.bump([db_obj.user_id])
+        logger.info(
+            "У заметки %s удалена категория %s", db_obj.id, category_id
+        )
+        return db_obj
+
+    async def existing_category_ids(
+        self, category_ids: Iterable[int], session: AsyncSession
+    ) -> Set[int]:
+        category_ids = set(category_ids)
+        if not category_ids:
+            return set()
+        result = await session.execute(
+            select(Category.id).where(Category.id.in_(category_ids))
+        )
+        return set(result.scalars().all())
+
+    async def check_batch_access(
+        self, note_ids: List[int], session: AsyncSession, user
+    ) -> Tuple[List[Optional[Tuple[int, str]]], Dict[int, int]]:
+        """A (status, detail) error or None for every id, in order.
 
-            if obj_in["category_ids"]:
-                existing_ids = await session.execute(
-                    select(Category.id).where(
-                        Category.id.in_(obj_in["category_ids"])
+        Also returns the owner id of every note found.
+        """
+        result = await session.execute(
+            select(self.model.id, self.model.user_id).where(
+                self.model.id.in_(set(note_ids))
+            )
+        )
+        owners = dict(result.all())
+        errors = []
+        seen = set()
+        for note_id in note_ids:
+            if note_id in seen:
+                errors.append(
+                    (
+                        status.HTTP_400_BAD_REQUEST,
+                        "Заметка повторяется в пакете",
                     )
                 )
-                existing_ids = set(existing_ids.scalars().all())
-
-                missing_ids = set(obj_in["category_ids"]) - existing_ids
-                if missing_ids:
-                    logger.warning(
-                        f"Попытка обновить заметку {db_obj.id} с несуществующими категориями: {missing_ids}"
+            elif note_id not in owners:
+                errors.append(
+                    (status.HTTP_404_NOT_FOUND, "Заметка не найдена!")
+                )
+            elif not user.is_admin and owners[note_id] != user.id:
+                errors.append(
+                    (
+                        status.HTTP_403_FORBIDDEN,
+                        "Нет доступа к этой заметке",
                     )
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
+                )
+            else:
+                errors.append(None)
+            seen.add(note_id)
+        return errors, owners
+
+    async def create_batch(
+        self, items: List[dict], user, session: AsyncSession
+    ) -> List[BatchItemResult]:
+        existing_ids = await self.existing_category_ids(
+            (
+                category_id
+                for item in items
+                for category_id in item.get("category_ids") or ()
+            ),
+            session,
+        )
+        results = []
+        valid = []
+        for index, item in enumerate(items):
+            missing_ids = set(item.get("category_ids") or ()) - existing_ids
+            if missing_ids:
+                results.append(
+                    BatchItemResult(
+                        index,
+                        status.HTTP_404_NOT_FOUND,
                         detail=f"Категории не найдены: {sorted(missing_ids)}",
                     )
+                )
+                continue
+            result = BatchItemResult(index, status.HTTP_201_CREATED)
+            results.append(result)
+            valid.append((result, item))
 
-                stmt = insert(note_category_association).values(
-                    [
-                        {"note_id": db_obj.id, "category_id": cat_id}
-                        for cat_id in obj_in["category_ids"]
-                    ]
+        if valid:
+            note_ids = await session.scalars(
+                insert(self.model).returning(
+                    self.model.id, sort_by_parameter_order=True
+                ),
+                [
+                    {
+                        "title": item["title"],
+                        "text": item.get("text"),
+                        "user_id": user.id,
+                    }
+                    for _, item in valid
+                ],
+            )
+            links = []
+            for (result, item), note_id in zip(valid, note_ids.all()):
+                result.id = note_id
+                links.extend(
+                    {"note_id": note_id, "category_id": category_id}
+                    for category_id in dict.fromkeys(
+                        item.get("category_ids") or ()
+                    )
                 )
-                await session.execute(stmt)
+            if links:
+                await session.execute(insert(note_category_association), links)
+            await session.commit()
+            await note_versions.bump([user.id])
+
+        logger.info(
+            "Пользователь %s создал пакет заметок (создано: %d из %d)",
+            user.id,
+            len(valid),
+            len(items),
+        )
+        return results
 
+    async def copy_rows(
+        self,
+        rows: List[Tuple[str, Optional[str], List[int]]],
+        user_id: int,
+        session: AsyncSession,
+    ) -> List[int]:
+        """Writes notes and their associations with COPY, asyncpg only."""
+        note_ids = await session.scalars(
+            select(
+                func.nextval(
+                    func.pg_get_serial_sequence(
+                        self.model.__tablename__, self.model.id.name
+                    )
+                )
+            ).select_from(func.generate_series(1, len(rows)))
+        )
+        note_ids = note_ids.all()
+        # The SELECT above opened the transaction COPY now joins.
+        connection = await session.connection()
+        driver = (await connection.get_raw_connection()).driver_connection
+        await driver.copy_records_to_table(
+            self.model.__tablename__,
+            records=[
+                (note_id, title, text, user_id)
+                for note_id, (title, text, _) in zip(note_ids, rows)
+            ],
+            columns=("id", "title", "text", "user_id"),
+        )
+        links = [
+            (note_id, category_id)
+            for note_id, (_, _, category_ids) in zip(note_ids, rows)
+            for category_id in dict.fromkeys(category_ids)
+        ]
+        if links:
+            await driver.copy_records_to_table(
+                note_category_association.name,
+                records=links,
+                columns=("note_id", "category_id"),
+            )
+        return note_ids
+
+    async def insert_rows(
+        self,
+        rows: List[Tuple[str, Optional[str], List[int]]],
+        user_id: int,
+        session: AsyncSession,
+    ) -> List[int]:
+        note_ids = await session.scalars(
+            insert(self.model).returning(
+                self.model.id, sort_by_parameter_order=True
+            ),
+            [
+                {"title": title, "text": text, "user_id": user_id}
+                for title, text, _ in rows
+            ],
+        )
+        note_ids = note_ids.all()
+        links = [
+            {"note_id": note_id, "category_id": category_id}
+            for note_id, (_, _, category_ids) in zip(note_ids, rows)
+            for category_id in dict.fromkeys(category_ids)
+        ]
+        if links:
+            await session.execute(insert(note_category_association), links)
+        return note_ids
+
+    async def import_rows(
+        self,
+        rows: List[Tuple[str, Optional[str], List[int]]],
+        user,
+        session: AsyncSession,
+    ) -> List[int]:
+        """Writes (title, text, category ids) rows and commits.
+
+        COPY on asyncpg, multi-row INSERTs elsewhere.
+        """
+        if session.get_bind().dialect.driver == "asyncpg":
+            note_ids = await self.copy_rows(rows, user.id, session)
+        else:
+            note_ids = await self.insert_rows(rows, user.id, session)
+        await session.commit()
+        await note_versions.bump([user.id])
+        return note_ids
+
+    async def update_batch(
+        self, items: List[dict], user, session: AsyncSession
+    ) -> List[BatchItemResult]:
+        access_errors, owners = await self.check_batch_access(
+            [item["id"] for item in items], session, user
+        )
+        existing_ids = await self.existing_category_ids(
+            (
+                category_id
+                for item in items
+                for category_id in item.get("category_ids") or ()
+            ),
+            session,
+        )
+        results = []
+        values = []
+        links = {}
+        for index, (item, error) in enumerate(zip(items, access_errors)):
+            note_id = item["id"]
+            if error is not None:
+                results.append(
+                    BatchItemResult(index, error[0], note_id, error[1])
+                )
+                continue
+            category_ids = item.get("category_ids")
+            missing_ids = set(category_ids or ()) - existing_ids
+            if missing_ids:
+                results.append(
+                    BatchItemResult(
+                        index,
+                        status.HTTP_404_NOT_FOUND,
+                        note_id,
+                        f"Категории не найдены: {sorted(missing_ids)}",
+                    )
+                )
+                continue
+            results.append(BatchItemResult(index, status.HTTP_200_OK, note_id))
+            row = {
+                field: value
+                for field, value in item.items()
+                if field != "category_ids" and value is not None
+            }
+            if len(row) > 1:
+                values.append(row)
+            if category_ids is not None:
+                links[note_id] = dict.fromkeys(category_ids)
+
+        if values:
+            await session.execute(update(self.model), values)
+        if links:
+            result = await session.execute(
+                select(
+                    note_category_association.c.note_id,
+                    note_category_association.c.category_id,
+                ).where(note_category_association.c.note_id.in_(links))
+            )
+            current = set(result.all())
+            wanted = {
+                (note_id, category_id)
+                for note_id, category_ids in links.items()
+                for category_id in category_ids
+            }
+            if current - wanted:
+                await session.execute(
+                    delete(note_category_association).where(
+                        tuple_(
+                            note_category_association.c.note_id,
+                            note_category_association.c.category_id,
+                        ).in_(current - wanted)
+                    )
+                )
+            if wanted - current:
+                await session.execute(
+                    insert(note_category_association),
+                    [
+                        {"note_id": note_id, "category_id": category_id}
+                        for note_id, category_id in wanted - current
+                    ],
+                )
+            # Notes whose categories changed but fields did not still count
+            # as modified.
+            touched = {note_id for note_id, _ in current ^ wanted} - {
+                row["id"] for row in values
+            }
+            if touched:
+                await session.execute(
+                    update(self.model)
+                    .where(self.model.id.in_(touched))
+                    .values(updated_at=func.now())
+                )
         await session.commit()
+        await note_versions.bump(
+            owners[result.id]
+            for result in results
+            if result.status == status.HTTP_200_OK
+        )
+
+        logger.info(
+            "Пользователь %s обновил пакет заметок (обновлено: %d из %d)",
+            user.id,
+            sum(r.status == status.HTTP_200_OK for r in results),
+            len(items),
+        )
+        return results
+
+    async def delete(
+        self, db_obj: ModelType, session: AsyncSession
+    ) -> ModelType:
+        db_obj = await super().delete(db_obj, session)
+        await note_versions.bump([db_obj.user_id])
+        return db_obj
+
+    async def delete_batch(
+        self, note_ids: List[int], user, session: AsyncSession
+    ) -> List[BatchItemResult]:
+        access_errors, owners = await self.check_batch_access(
+            note_ids, session, user
+        )
+        results = []
+        allowed = []
+        for index, (note_id, error) in enumerate(zip(note_ids, access_errors)):
+            if error is not None:
+                results.append(
+                    BatchItemResult(index, error[0], note_id, error[1])
+                )
+                continue
+            results.append(
+                BatchItemResult(index, status.HTTP_204_NO_CONTENT, note_id)
+            )
+            allowed.append(note_id)
 
-        logger.info(f"Заметка {db_obj.id} обновлена. Новые данные: {obj_in}")
+        if allowed:
+            # Associations go with the notes through ON DELETE CASCADE.
+            await session.execute(
+                delete(self.model).where(self.model.id.in_(allowed))
+            )
+            await session.commit()
+            await note_versions.bump(owners[note_id] for note_id in allowed)
 
-        note_with_categories = await session.execute(
-            select(Note)
-            .options(selectinload(Note.categories))
-            .where(Note.id == db_obj.id)
+        logger.info(
+            "Пользователь %s удалил пакет заметок (удалено: %d из %d)",
+            user.id,
+            len(allowed),
+            len(note_ids),
         )
-        return note_with_categories.scalars().first()
+        return results
 
 
 note_crud = CRUDNote(Note)
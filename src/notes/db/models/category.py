@@ -1,6 +1,6 @@
 from typing import List
 
-from sqlalchemy import Column, ForeignKey, Integer, String, Table
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, Table
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from notes.core.constants import TITLE_MAX_LEN
@@ -21,17 +21,26 @@ note_category_association = Table(
         ForeignKey("category.id", ondelete="CASCADE"),
         primary_key=True,
     ),
+    # The primary key leads with note_id, category lookups need the reverse.
+    Index(
+        "ix_note_category_association_category_id_note_id",
+        "category_id",
+        "note_id",
+    ),
 )
 
 
 class Category(Base):
-    name: Mapped[str] = mapped_column(String(TITLE_MAX_LEN), nullable=False)
+    name: Mapped[str] = mapped_column(
+        String(TITLE_MAX_LEN), nullable=False, unique=True, index=True
+    )
 
     notes: Mapped[List["Note"]] = relationship(  # noqa
         "Note",
         secondary=note_category_association,
         back_populates="categories",
-        lazy="selectin",
+        lazy="raise",
+        passive_deletes=True,
     )
 
     def __repr__(self) -> str:
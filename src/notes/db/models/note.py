@@ -1,15 +1,23 @@
 from typing import List
 
-from sqlalchemy import ForeignKey, String, Text
+from sqlalchemy import ForeignKey, Index, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from notes.core.constants import TITLE_MAX_LEN
 from notes.core.db import Base
+from notes.db.search import register_search_ddl
 
 from .category import note_category_association
 
 
 class Note(Base):
+    __table_args__ = (
+        # Serves the per-user keyset pagination order.
+        Index("ix_note_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Serves the admin (unfiltered) keyset pagination order.
+        Index("ix_note_created_at_id", "created_at", "id"),
+    )
+
     title: Mapped[str] = mapped_column(String(TITLE_MAX_LEN), nullable=False)
     text: Mapped[str] = mapped_column(Text, nullable=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
@@ -21,3 +29,6 @@ class Note(Base):
 
     def __repr__(self) -> str:
         return f"<Note(id={self.id}, title={self.title!r}, user_id={self.user_id})>"  # noqa
+
+
+register_search_ddl(Note.__table__)
@@ -0,0 +1,200 @@
+import html
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+from sqlalchemy import DDL, Table, event, func, literal_column, select
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.sql import Select, column, table
+
+from notes.core.constants import (SEARCH_HIGHLIGHT_START,
+                                  SEARCH_HIGHLIGHT_STOP, SEARCH_SNIPPET_WORDS,
+                                  SEARCH_TS_CONFIG)
+
+# PostgreSQL keeps the vector in a generated column, so every INSERT and
+# UPDATE of title/text refreshes it without application code.
+POSTGRES_SEARCH_DDL = (
+    f"""
+    ALTER TABLE note ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(title, '')), 'A')
+        || setweight(
+            to_tsvector('{SEARCH_TS_CONFIG}', coalesce(text, '')), 'B'
+        )
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_note_search_vector "
+    "ON note USING gin (search_vector)",
+)
+
+# SQLite falls back to an external-content FTS5 table synced by triggers.
+SQLITE_SEARCH_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS note_fts USING fts5(
+        title, text, content='note', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS note_fts_ai AFTER INSERT ON note BEGIN
+        INSERT INTO note_fts(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS note_fts_ad AFTER DELETE ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS note_fts_au AFTER UPDATE OF title, text
+    ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO note_fts(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+)
+
+
+def is_search_object(name: str) -> bool:
+    """Schema objects created by the DDL above instead of the models.
+
+    Alembic autogenerate must not drop them.
+    """
+    return name in ("search_vector", "ix_note_search_vector") or (
+        name.startswith("note_fts")
+    )
+
+
+@dataclass
+class SearchHit:
+    note: Any
+    rank: float
+    title_highlight: Optional[str] = None
+    text_highlight: Optional[str] = None
+
+
+@dataclass
+class SearchPage:
+    items: List[SearchHit] = field(default_factory=list)
+    next_offset: Optional[int] = None
+
+
+# The database wraps matches in private use characters, the fragment is
+# escaped before they become tags. A stray one in the note text can only
+# turn into a <mark>, never into other markup.
+MATCH_START = "\ue000"
+MATCH_STOP = "\ue001"
+
+search_vector = literal_column("note.search_vector", TSVECTOR)
+ts_config = literal_column(f"'{SEARCH_TS_CONFIG}'::regconfig")
+note_fts = table("note_fts", column("rowid"), column("note_fts"))
+
+
+def register_search_ddl(note_table: Table) -> None:
+    for statement in POSTGRES_SEARCH_DDL:
+        event.listen(
+            note_table,
+            "after_create",
+            DDL(statement).execute_if(dialect="postgresql"),
+        )
+    for statement in SQLITE_SEARCH_DDL:
+        event.listen(
+            note_table,
+            "after_create",
+            DDL(statement).execute_if(dialect="sqlite"),
+        )
+    event.listen(
+        note_table,
+        "before_drop",
+        DDL("DROP TABLE IF EXISTS note_fts").execute_if(dialect="sqlite"),
+    )
+
+
+def fts5_query(text: str) -> str:
+    """Quote every word so user input is never parsed as FTS5 syntax."""
+    terms = ('"{}"'.format(term.replace('"', '""')) for term in text.split())
+    return " ".join(terms)
+
+
+def search_statement(
+    dialect: str, model, text: str, *criteria, limit: int, offset: int
+) -> Select:
+    """Select ``(note, rank, title_highlight, text_highlight)`` rows.
+
+    Higher rank means a better match on every backend.
+    """
+    if dialect == "sqlite":
+        fts = literal_column("note_fts")
+        rank = -func.bm25(fts, 10.0, 1.0)
+        return (
+            select(
+                model,
+                rank.label("rank"),
+                func.highlight(fts, 0, MATCH_START, MATCH_STOP).label(
+                    "title_highlight"
+                ),
+                func.snippet(
+                    fts,
+                    1,
+                    MATCH_START,
+                    MATCH_STOP,
+                    "…",
+                    SEARCH_SNIPPET_WORDS,
+                ).label("text_highlight"),
+            )
+            .select_from(note_fts)
+            .join(model, model.id == note_fts.c.rowid)
+            .where(note_fts.c.note_fts.op("MATCH")(fts5_query(text)))
+            .where(*criteria)
+            .order_by(rank.desc(), model.id.desc())
+            .limit(limit)
+            .offset(offset)
+        )
+
+    query = func.websearch_to_tsquery(ts_config, text)
+    rank = func.ts_rank_cd(search_vector, query)
+    # Rank and cut the page first so ts_headline only runs on the hits
+    # that are actually returned.
+    hits = (
+        select(model.id, rank.label("rank"))
+        .where(search_vector.op("@@")(query), *criteria)
+        .order_by(rank.desc(), model.id.desc())
+        .limit(limit)
+        .offset(offset)
+        .subquery()
+    )
+    return (
+        select(
+            model,
+            hits.c.rank,
+            headline(model.title, query).label("title_highlight"),
+            headline(model.text, query).label("text_highlight"),
+        )
+        .join(hits, hits.c.id == model.id)
+        .order_by(hits.c.rank.desc(), model.id.desc())
+    )
+
+
+def headline(value, query):
+    options = (
+        f"StartSel={MATCH_START}, "
+        f"StopSel={MATCH_STOP}, "
+        f"MaxWords={SEARCH_SNIPPET_WORDS}, MinWords=5, MaxFragments=2"
+    )
+    return func.ts_headline(
+        ts_config, func.coalesce(value, ""), query, options
+    )
+
+
+def render_highlight(value: Optional[str]) -> Optional[str]:
+    """HTML-escaped fragment with the matches wrapped in highlight tags."""
+    if value is None:
+        return None
+    return (
+        html.escape(value)
+        .replace(MATCH_START, SEARCH_HIGHLIGHT_START)
+        .replace(MATCH_STOP, SEARCH_HIGHLIGHT_STOP)
+    )
@@ -1,24 +1,113 @@
-from fastapi import FastAPI
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from sqladmin import Admin
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from starlette.middleware.sessions import SessionMiddleware
 
 from notes.admin.auth import AdminAuth
 from notes.admin.views import CategoryAdmin, NoteAdmin, UserAdmin
 from notes.api.routers import api_router
 from notes.core.config import settings
-from notes.core.db import engine
+from notes.core.db import (ReadYourWritesMiddleware, engine, pool_stats,
+                           read_engine, warm_up_pool)
+from notes.core.log import setup_logging, stop_logging
+from notes.core.metrics import (MetricsMiddleware, instrument_engine,
+                                register_snapshot)
+from notes.core.passwords import PasswordHasherBusy, password_hasher
+from notes.core.query_budget import QueryBudgetMiddleware, install_recorder
+from notes.core.user import jwt_strategy
+from notes.web.chat import broadcaster as chat_broadcaster
+from notes.web.chat import relay as chat_relay
 from notes.web.routers import web_router
 
-app = FastAPI(title=settings.APP_TITLE, description=settings.DESCRIPTION)
+setup_logging()
+logger = logging.getLogger(__name__)
+
+instrument_engine(engine, "primary")
+if read_engine is not None:
+    instrument_engine(read_engine, "replica")
+register_snapshot(
+    "db_pool_checkout", pool_stats.snapshot, ["checkouts", "timeouts"]
+)
+register_snapshot(
+    "chat",
+    chat_broadcaster.metrics,
+    ["messages_published", "messages_dropped", "slow_disconnects"],
+)
+register_snapshot("password_hash", password_hasher.metrics)
+register_snapshot("jwt_cache", jwt_strategy.metrics, ["hits", "misses"])
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DB_POOL_WARMUP > 0:
+        try:
+            await warm_up_pool(engine, settings.DB_POOL_WARMUP)
+        except Exception:
+            logger.exception("Не удалось прогреть пул соединений с БД")
+    yield
+    await chat_relay.stop()
+    password_hasher.shutdown()
+    await engine.dispose()
+    if read_engine is not None:
+        await read_engine.dispose()
+    stop_logging()
+
+
+app = FastAPI(
+    title=settings.APP_TITLE,
+    description=settings.DESCRIPTION,
+    lifespan=lifespan,
+)
 
+# Added before SessionMiddleware so it runs inside it and can stamp the
+# session cookie on successful writes.
+app.add_middleware(ReadYourWritesMiddleware)
 app.add_middleware(
     SessionMiddleware,
     secret_key=str(getattr(settings, "SESSION_SECRET", settings.SECRET_KEY)),
     session_cookie="notes_session",
     same_site="lax",
 )
+if settings.QUERY_BUDGET_MODE != "off":
+    install_recorder(engine)
+    if read_engine is not None:
+        install_recorder(read_engine)
+    app.add_middleware(QueryBudgetMiddleware)
+# Outermost, so the latency covers every other middleware.
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "База данных перегружена, повторите запрос позже"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(
+    request: Request, exc: PasswordHasherBusy
+):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Сервер перегружен, повторите вход позже"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 
 templates = Jinja2Templates(directory="notes/templates")
 app.state.templates = templates
@@ -21,6 +21,14 @@ function renderEvent(obj) {
   historyBox.scrollTop = historyBox.scrollHeight;
 }
 
+function renderFrame(obj) {
+  if (obj.type === "history") {
+    obj.messages.forEach(renderEvent);
+  } else {
+    renderEvent(obj);
+  }
+}
+
 function escapeHtml(s) {
   return s.replace(/[&<>"']/g, (c) => ({ "&":"&amp;","<":"&lt;",">":"&gt;",'"':"&quot;","'":"&#39;" }[c]));
 }
@@ -39,11 +47,11 @@ nicknameForm.addEventListener("submit", (e) => {
   ws.onmessage = (ev) => {
     try {
       const obj = JSON.parse(ev.data);
-      renderEvent(obj);
+      renderFrame(obj);
     } catch {
       try {
         const obj = JSON.parse(new TextDecoder("utf-8").decode(ev.data));
-        renderEvent(obj);
+        renderFrame(obj);
       } catch {}
     }
   };
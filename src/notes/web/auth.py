@@ -6,8 +6,10 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from notes.api.schemas.user import UserCreate
-from notes.core.db import get_async_session
+from notes.core.db import get_async_session, get_read_session
+from notes.core.passwords import PasswordHasherBusy, password_hasher
 from notes.core.user import get_user_manager
+from notes.core.user_cache import get_session_user, user_cache
 from notes.db.models import User
 
 router = APIRouter()
@@ -15,17 +17,10 @@ router = APIRouter()
 
 @router.get("/login", response_class=HTMLResponse)
 async def login_form(
-    request: Request, session: AsyncSession = Depends(get_async_session)
+    request: Request, session: AsyncSession = Depends(get_read_session)
 ):
     templates = request.app.state.templates
-    user_id = request.session.get("user_id")
-    user = None
-    if user_id:
-        user = (
-            (await session.execute(select(User).where(User.id == user_id)))
-            .scalars()
-            .first()
-        )
+    user = await get_session_user(request, session)
     return templates.TemplateResponse(
         "auth/login.html", {"request": request, "user": user}
     )
@@ -37,7 +32,6 @@ async def login(
     email: str = Form(""),
     password: str = Form(""),
     session: AsyncSession = Depends(get_async_session),
-    user_manager=Depends(get_user_manager),
 ):
     templates = request.app.state.templates
     email = email.strip().lower()
@@ -65,12 +59,25 @@ async def login(
             },
             status_code=status.HTTP_400_BAD_REQUEST,
         )
-    (
-        verified,
-        updated_password_hash,
-    ) = user_manager.password_helper.verify_and_update(
-        password, user.hashed_password
-    )
+    try:
+        (
+            verified,
+            updated_password_hash,
+        ) = await password_hasher.verify_and_update(
+            password, user.hashed_password
+        )
+    except PasswordHasherBusy:
+        return templates.TemplateResponse(
+            "auth/login.html",
+            {
+                "request": request,
+                "user": None,
+                "error": "Сервер перегружен, попробуйте войти чуть позже",
+                "email_value": email,
+            },
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "1"},
+        )
     if not verified:
         return templates.TemplateResponse(
             "auth/login.html",
@@ -85,23 +92,17 @@ async def login(
     if updated_password_hash:
         user.hashed_password = updated_password_hash
         await session.commit()
+        await user_cache.invalidate(user.id)
     request.session["user_id"] = user.id
     return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
 
 
 @router.get("/register", response_class=HTMLResponse)
 async def register_form(
-    request: Request, session: AsyncSession = Depends(get_async_session)
+    request: Request, session: AsyncSession = Depends(get_read_session)
 ):
     templates = request.app.state.templates
-    user_id = request.session.get("user_id")
-    user = None
-    if user_id:
-        user = (
-            (await session.execute(select(User).where(User.id == user_id)))
-            .scalars()
-            .first()
-        )
+    user = await get_session_user(request, session)
     return templates.TemplateResponse(
         "auth/register.html", {"request": request, "user": user}
     )
@@ -164,6 +165,18 @@ async def register(
             },
             status_code=status.HTTP_400_BAD_REQUEST,
         )
+    except PasswordHasherBusy:
+        return templates.TemplateResponse(
+            "auth/register.html",
+            {
+                "request": request,
+                "user": None,
+                "error": "Сервер перегружен, попробуйте чуть позже",
+                "email_value": email,
+            },
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "1"},
+        )
     except Exception:
         return templates.TemplateResponse(
             "auth/register.html",
@@ -3,34 +3,59 @@ from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from notes.core.broadcast import Broadcaster, RedisRelay
+from notes.core.config import settings
 from notes.core.constants import (HISTORY_LAST_N_MESSAGES,
                                   HISTORY_MAX_SAVE_LEN, LIST_END,
-                                  REDIS_CHAT_HISTORY_KEY)
-from notes.core.db import get_async_session
+                                  REDIS_CHAT_CHANNEL, REDIS_CHAT_HISTORY_KEY)
+from notes.core.db import get_read_session
+from notes.core.query_budget import query_budget
 from notes.core.redis import get_redis
-from notes.db.models import User
+from notes.core.user_cache import get_session_user
 
 router = APIRouter()
 ws_router = APIRouter()
-connections = set()
+broadcaster = Broadcaster(
+    queue_size=settings.CHAT_SEND_QUEUE_SIZE,
+    policy=settings.CHAT_SLOW_CONSUMER_POLICY,
+)
+relay = RedisRelay(broadcaster, REDIS_CHAT_CHANNEL)
+
+
+def chat_event(event_type: str, nickname: str, text: str) -> str:
+    return json.dumps(
+        {
+            "type": event_type,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "nickname": nickname,
+            "text": text,
+        },
+        ensure_ascii=False,
+    )
+
+
+def history_frame(history: list[str]) -> str:
+    # Stored events are JSON already, so the batch is spliced as text.
+    return '{"type": "history", "messages": [' + ", ".join(history) + "]}"
+
+
+async def publish(r, payload: str) -> None:
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.rpush(REDIS_CHAT_HISTORY_KEY, payload)
+        pipe.ltrim(REDIS_CHAT_HISTORY_KEY, -HISTORY_MAX_SAVE_LEN, LIST_END)
+        pipe.publish(relay.channel, payload)
+        await pipe.execute()
 
 
 @router.get("/", response_class=HTMLResponse)
+@query_budget(2)
 async def chat_page(
-    request: Request, session: AsyncSession = Depends(get_async_session)
+    request: Request, session: AsyncSession = Depends(get_read_session)
 ):
     templates = request.app.state.templates
-    user_id = request.session.get("user_id")
-    user = None
-    if user_id:
-        user = (
-            (await session.execute(select(User).where(User.id == user_id)))
-            .scalars()
-            .first()
-        )
+    user = await get_session_user(request, session)
     return templates.TemplateResponse(
         "chat/chat.html", {"request": request, "user": user}
     )
@@ -43,55 +68,28 @@ async def anon_chat_ws(websocket: WebSocket):
     if not nickname:
         await websocket.close()
         return
-    connections.add(websocket)
     r = await get_redis()
+    await relay.start(r)
+    # Subscribed before the history is read, events published in between
+    # arrive both ways and the live copy is dropped.
+    connection = broadcaster.connect(websocket, hold=True)
     try:
         history = await r.lrange(
-            REDIS_CHAT_HISTORY_KEY, HISTORY_LAST_N_MESSAGES, LIST_END
+            REDIS_CHAT_HISTORY_KEY, -HISTORY_LAST_N_MESSAGES, LIST_END
         )
-        for item in history:
-            await websocket.send_text(item)
-        join_event = {
-            "type": "system",
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "nickname": "",
-            "text": f"{nickname} вошёл в чат",
-        }
-        await r.rpush(
-            REDIS_CHAT_HISTORY_KEY, json.dumps(join_event, ensure_ascii=False)
+        broadcaster.release(
+            connection,
+            backlog=[history_frame(history)] if history else [],
+            seen=history,
         )
-        await r.ltrim(REDIS_CHAT_HISTORY_KEY, HISTORY_MAX_SAVE_LEN, LIST_END)
-        for conn in list(connections):
-            await conn.send_text(json.dumps(join_event, ensure_ascii=False))
+        await publish(r, chat_event("system", "", f"{nickname} вошёл в чат"))
         while True:
-            text = await websocket.receive_text()
-            msg = {
-                "type": "message",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "nickname": nickname,
-                "text": text.strip(),
-            }
-            if not msg["text"]:
+            text = (await websocket.receive_text()).strip()
+            if not text:
                 continue
-            await r.rpush(
-                REDIS_CHAT_HISTORY_KEY, json.dumps(msg, ensure_ascii=False)
-            )
-            await r.ltrim(
-                REDIS_CHAT_HISTORY_KEY, HISTORY_MAX_SAVE_LEN, LIST_END
-            )
-            for conn in list(connections):
-                await conn.send_text(json.dumps(msg, ensure_ascii=False))
+            await publish(r, chat_event("message", nickname, text))
     except WebSocketDisconnect:
-        leave_event = {
-            "type": "system",
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "nickname": "",
-            "text": f"{nickname} вышел из чата",
-        }
-        await r.rpush(
-            REDIS_CHAT_HISTORY_KEY, json.dumps(leave_event, ensure_ascii=False)
-        )
-        await r.ltrim(REDIS_CHAT_HISTORY_KEY, HISTORY_MAX_SAVE_LEN, LIST_END)
-        connections.discard(websocket)
-        for conn in list(connections):
-            await conn.send_text(json.dumps(leave_event, ensure_ascii=False))
+        await broadcaster.disconnect(connection)
+        await publish(r, chat_event("system", "", f"{nickname} вышел из чата"))
+    finally:
+        await broadcaster.disconnect(connection)
@@ -1,31 +1,33 @@
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import HTMLResponse
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from notes.core.db import get_async_session
+from notes.core.db import get_read_session
+from notes.core.query_budget import query_budget
+from notes.core.user_cache import get_session_user
 from notes.db.crud.note import note_crud
-from notes.db.models import User
 
 router = APIRouter()
 
 
 @router.get("/", response_class=HTMLResponse)
+@query_budget(4)
 async def index(
-    request: Request, session: AsyncSession = Depends(get_async_session)
+    request: Request, session: AsyncSession = Depends(get_read_session)
 ):
     templates = request.app.state.templates
-    user_id = request.session.get("user_id")
-    if not user_id:
+    user = await get_session_user(request, session)
+    if not user:
         return templates.TemplateResponse(
             "index.html", {"request": request, "user": None}
         )
-    user = (
-        (await session.execute(select(User).where(User.id == user_id)))
-        .scalars()
-        .first()
-    )
-    notes = await note_crud.get_multi_filtered(session=session, user=user)
+    page = await note_crud.get_page_filtered(session=session, user=user)
     return templates.TemplateResponse(
-        "index.html", {"request": request, "user": user, "notes": notes}
+        "index.html",
+        {
+            "request": request,
+            "user": user,
+            "notes": page.items,
+            "next_cursor": page.next_cursor,
+        },
     )
@@ -2,36 +2,49 @@ from typing import List, Optional
 
 from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
 from fastapi.responses import HTMLResponse, RedirectResponse
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from notes.core.db import get_async_session
+from notes.core.category_cache import category_catalogue
+from notes.core.db import get_async_session, get_read_session
+from notes.core.pagination import Cursor, decode_cursor
+from notes.core.query_budget import query_budget
+from notes.core.user_cache import UserSnapshot, get_session_user
 from notes.db.crud.note import note_crud
-from notes.db.models import Category, User
 
 router = APIRouter()
 
 
 async def get_current_user(
     request: Request, session: AsyncSession
-) -> Optional[User]:
-    user_id = request.session.get("user_id")
-    if not user_id:
+) -> Optional[UserSnapshot]:
+    return await get_session_user(request, session)
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
         return None
-    result = await session.execute(select(User).where(User.id == user_id))
-    return result.scalars().first()
 
 
 @router.get("", response_class=HTMLResponse)
+@query_budget(4)
 async def notes_list_no_slash(
-    request: Request, session: AsyncSession = Depends(get_async_session)
+    request: Request,
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
 ):
-    return await notes_list(request, session)
+    return await notes_list(request, cursor, session)
 
 
 @router.get("/", response_class=HTMLResponse)
+@query_budget(4)
 async def notes_list(
-    request: Request, session: AsyncSession = Depends(get_async_session)
+    request: Request,
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
 ):
     templates = request.app.state.templates
     user = await get_current_user(request, session)
@@ -39,15 +52,25 @@ async def notes_list(
         return RedirectResponse(
             url="/auth/login", status_code=status.HTTP_303_SEE_OTHER
         )
-    notes = await note_crud.get_multi_filtered(session=session, user=user)
+    page = await note_crud.get_page_filtered(
+        session=session, user=user, cursor=parse_cursor(cursor)
+    )
     return templates.TemplateResponse(
-        "notes/list.html", {"request": request, "user": user, "notes": notes}
+        "notes/list.html",
+        {
+            "request": request,
+            "user": user,
+            "notes": page.items,
+            "next_cursor": page.next_cursor,
+            "prev_cursor": page.prev_cursor,
+        },
     )
 
 
 @router.get("/new", response_class=HTMLResponse)
+@query_budget(2)
 async def notes_create_form(
-    request: Request, session: AsyncSession = Depends(get_async_session)
+    request: Request, session: AsyncSession = Depends(get_read_session)
 ):
     templates = request.app.state.templates
     user = await get_current_user(request, session)
@@ -55,7 +78,7 @@ async def notes_create_form(
         return RedirectResponse(
             url="/auth/login", status_code=status.HTTP_303_SEE_OTHER
         )
-    categories = (await session.execute(select(Category))).scalars().all()
+    categories = list((await category_catalogue.get_all(session)).values())
     return templates.TemplateResponse(
         "notes/create.html",
         {"request": request, "user": user, "categories": categories},
@@ -63,6 +86,7 @@ async def notes_create_form(
 
 
 @router.post("/create")
+@query_budget(5)
 async def notes_create(
     request: Request,
     title: str = Form(...),
@@ -85,10 +109,11 @@ async def notes_create(
 
 
 @router.get("/{note_id}", response_class=HTMLResponse)
+@query_budget(4)
 async def notes_detail(
     note_id: int,
     request: Request,
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     templates = request.app.state.templates
     user = await get_current_user(request, session)
@@ -109,10 +134,11 @@ async def notes_detail(
 
 
 @router.get("/{note_id}/edit", response_class=HTMLResponse)
+@query_budget(4)
 async def notes_edit_form(
     note_id: int,
     request: Request,
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     templates = request.app.state.templates
     user = await get_current_user(request, session)
@@ -125,7 +151,7 @@ async def notes_edit_form(
     )
     if not note:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    categories = (await session.execute(select(Category))).scalars().all()
+    categories = list((await category_catalogue.get_all(session)).values())
     selected_ids = [c.id for c in note.categories]
     return templates.TemplateResponse(
         "notes/edit.html",
@@ -0,0 +1,83 @@
+import os
+import tempfile
+
+# Settings are read on import, so the environment comes first. The
+# database is always a scratch one, the schema is dropped for every test.
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///" + os.path.join(
+    tempfile.mkdtemp(prefix="notes-tests-"), "notes.db"
+)
+os.environ["DATABASE_REPLICA_URL"] = ""
+os.environ.setdefault("DESCRIPTION", "tests")
+os.environ.setdefault("PRODUCTION", "true")
+os.environ.setdefault("ADMIN", "admin")
+os.environ.setdefault("SECRET_KEY", "tests")
+os.environ.setdefault("DB_POOL_WARMUP", "0")
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from benchmarks.memory_redis import MemoryRedis  # noqa: E402
+from notes.core.base import Base  # noqa: E402
+from notes.core.category_cache import category_catalogue  # noqa: E402
+from notes.core.db import engine  # noqa: E402
+from notes.core.redis import set_redis  # noqa: E402
+from notes.core.user import jwt_strategy  # noqa: E402
+from notes.core.user_cache import user_cache  # noqa: E402
+from notes.main import app  # noqa: E402
+
+pytest_plugins = ["devtools.pytest_query_budget"]
+
+PASSWORD = "password123"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def database():
+    """Empty schema and cold caches for every test."""
+    set_redis(MemoryRedis())
+    user_cache.local.clear()
+    jwt_strategy.tokens.clear()
+    category_catalogue.categories = None
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    yield
+    await engine.dispose()
+
+
+@pytest.fixture
+async def client(database):
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://tests"
+    ) as client:
+        yield client
+
+
+async def register(
+    client: httpx.AsyncClient, email: str, is_admin: bool = False
+) -> dict:
+    """Creates a user and returns its Authorization header."""
+    response = await client.post(
+        "/auth/register",
+        json={"email": email, "password": PASSWORD, "is_admin": is_admin},
+    )
+    assert response.status_code == 201, response.text
+    response = await client.post(
+        "/auth/jwt/login", data={"username": email, "password": PASSWORD}
+    )
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+async def admin(client):
+    return await register(client, "admin@example.com", is_admin=True)
+
+
+@pytest.fixture
+async def user(client):
+    return await register(client, "user@example.com")
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from benchmarks.memory_redis import MemoryRedis
+from notes.core.broadcast import Broadcaster, RedisRelay
+from notes.core.constants import REDIS_CHAT_CHANNEL
+from notes.web.chat import publish
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.received: asyncio.Queue = asyncio.Queue()
+
+    async def send_text(self, payload: str) -> None:
+        self.received.put_nowait(payload)
+
+
+@pytest.fixture
+async def instances():
+    """Two app workers sharing one Redis, each with a connected socket."""
+    redis = MemoryRedis()
+    workers = []
+    for _ in range(2):
+        broadcaster = Broadcaster(queue_size=10)
+        relay = RedisRelay(broadcaster, REDIS_CHAT_CHANNEL)
+        await relay.start(redis)
+        socket = FakeWebSocket()
+        connection = broadcaster.connect(socket)
+        workers.append((broadcaster, relay, socket, connection))
+    yield redis, workers
+    for broadcaster, relay, _, connection in workers:
+        await broadcaster.disconnect(connection)
+        await relay.stop()
+
+
+async def test_relay_delivers_to_every_instance(instances):
+    redis, workers = instances
+
+    await publish(redis, "hello")
+
+    for _, _, socket, _ in workers:
+        assert await asyncio.wait_for(socket.received.get(), 1) == "hello"
+        assert socket.received.empty()
+
+
+async def test_stopped_relay_no_longer_delivers(instances):
+    redis, workers = instances
+    _, stopped, stopped_socket, _ = workers[0]
+    _, _, live_socket, _ = workers[1]
+
+    await stopped.stop()
+    await publish(redis, "hello")
+
+    assert await asyncio.wait_for(live_socket.received.get(), 1) == "hello"
+    await asyncio.sleep(0.05)
+    assert stopped_socket.received.empty()
+
+
+async def test_held_connection_skips_events_already_in_backlog():
+    broadcaster = Broadcaster(queue_size=10)
+    socket = FakeWebSocket()
+    connection = broadcaster.connect(socket, hold=True)
+    broadcaster.publish("old")
+    broadcaster.publish("new")
+
+    broadcaster.release(connection, backlog=["history"], seen=["old"])
+
+    received = [
+        await asyncio.wait_for(socket.received.get(), 1) for _ in range(2)
+    ]
+    assert received == ["history", "new"]
+    await broadcaster.disconnect(connection)
@@ -0,0 +1,44 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def notes_counts(client, headers=None) -> list:
+    response = await client.get("/category/", headers=headers)
+    assert response.status_code == 200, response.text
+    return [category["notes_count"] for category in response.json()]
+
+
+async def test_notes_count_is_scoped_to_visible_notes(client, admin, user):
+    response = await client.post(
+        "/category/", json={"name": "c1"}, headers=admin
+    )
+    assert response.status_code == 201, response.text
+    for headers in (admin, user, user):
+        response = await client.post(
+            "/note/", json={"title": "x", "category_ids": [1]}, headers=headers
+        )
+        assert response.status_code == 201, response.text
+
+    assert await notes_counts(client) == [0]
+    assert await notes_counts(client, user) == [2]
+    assert await notes_counts(client, admin) == [3]
+    response = await client.get("/category/1", headers=user)
+    assert response.json()["notes_count"] == 2
+
+
+async def test_rename_to_taken_name_is_rejected(client, admin):
+    for name in ("c1", "c2"):
+        response = await client.post(
+            "/category/", json={"name": name}, headers=admin
+        )
+        assert response.status_code == 201, response.text
+
+    response = await client.patch(
+        "/category/2/update", json={"name": "c1"}, headers=admin
+    )
+    assert response.status_code == 400, response.text
+    response = await client.patch(
+        "/category/2/update", json={"name": "c2"}, headers=admin
+    )
+    assert response.status_code == 200, response.text
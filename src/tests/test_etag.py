@@ -0,0 +1,60 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def revalidate(client, url: str, headers: dict, etag: str) -> int:
+    response = await client.get(
+        url, headers={**headers, "If-None-Match": etag}
+    )
+    return response.status_code
+
+
+async def get_etag(client, url: str, headers: dict) -> str:
+    response = await client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.headers["ETag"]
+
+
+@pytest.fixture
+async def note_id(client, user) -> int:
+    response = await client.post("/note/", json={"title": "x"}, headers=user)
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+@pytest.mark.parametrize("url", ["/note/", "/note/{}", "/category/"])
+async def test_not_modified_reads_no_rows(
+    client, user, note_id, assert_query_budget, url
+):
+    url = url.format(note_id)
+    etag = await get_etag(client, url, user)
+
+    with assert_query_budget(0):
+        assert await revalidate(client, url, user, etag) == 304
+
+
+async def test_writes_move_only_the_owners_etag(client, admin, user, note_id):
+    user_etag = await get_etag(client, "/note/", user)
+    admin_etag = await get_etag(client, "/note/", admin)
+
+    response = await client.post("/note/", json={"title": "y"}, headers=admin)
+    assert response.status_code == 201, response.text
+    assert await revalidate(client, "/note/", user, user_etag) == 304
+    assert await revalidate(client, "/note/", admin, admin_etag) == 200
+
+    response = await client.patch(
+        f"/note/{note_id}/update", json={"title": "z"}, headers=admin
+    )
+    assert response.status_code == 200, response.text
+    assert await revalidate(client, "/note/", user, user_etag) == 200
+
+
+async def test_category_change_moves_note_etag(client, admin, user, note_id):
+    etag = await get_etag(client, f"/note/{note_id}", user)
+
+    response = await client.post(
+        "/category/", json={"name": "c1"}, headers=admin
+    )
+    assert response.status_code == 201, response.text
+    assert await revalidate(client, f"/note/{note_id}", user, etag) == 200
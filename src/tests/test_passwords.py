@@ -0,0 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from notes.core.passwords import PasswordHasher
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_failed_submit_gives_the_slot_back():
+    hasher = PasswordHasher(workers=1, max_waiting=1, queue_timeout=0.1)
+    hasher.executor = ThreadPoolExecutor(1)
+    hasher.executor.shutdown()
+
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            await hasher.run("hash", str, "password")
+    assert hasher.metrics() == {"waiting": 0, "in_flight": 0}
+
+    hasher.executor = None
+    assert await hasher.run("hash", str, "password") == "password"
+    hasher.shutdown()
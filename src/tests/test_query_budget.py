@@ -0,0 +1,157 @@
+from typing import NamedTuple, Optional
+
+import pytest
+
+from notes.main import app
+
+pytestmark = pytest.mark.anyio
+
+
+class Case(NamedTuple):
+    method: str
+    route: str
+    url: str
+    status: int
+    json: Optional[dict] = None
+    as_admin: bool = False
+
+
+CASES = [
+    Case("POST", "/note/", "/note/", 201, {"title": "x", "category_ids": [1]}),
+    Case(
+        "POST",
+        "/note/batch",
+        "/note/batch",
+        200,
+        {"items": [{"title": "x", "category_ids": [1, 2]}, {"title": "y"}]},
+    ),
+    Case(
+        "POST",
+        "/note/{note_id}/categories",
+        "/note/1/categories",
+        200,
+        {"category_ids": [2]},
+    ),
+    Case(
+        "PATCH",
+        "/note/batch",
+        "/note/batch",
+        200,
+        {"items": [{"id": 1, "title": "x"}, {"id": 2, "category_ids": [2]}]},
+    ),
+    Case(
+        "PATCH",
+        "/note/{note_id}/update",
+        "/note/1/update",
+        200,
+        {"title": "x", "category_ids": [2]},
+    ),
+    Case("GET", "/note/", "/note/", 200),
+    Case("GET", "/note/search", "/note/search?q=apple", 200),
+    Case("GET", "/note/{note_id}", "/note/1", 200),
+    Case("DELETE", "/note/batch", "/note/batch", 200, {"ids": [1, 2]}),
+    Case(
+        "DELETE",
+        "/note/{note_id}/categories/{category_id}",
+        "/note/1/categories/1",
+        200,
+    ),
+    Case("DELETE", "/note/{note_id}/delete", "/note/1/delete", 204),
+    Case("POST", "/category/", "/category/", 201, {"name": "c3"}, True),
+    Case("GET", "/category/", "/category/", 200),
+    Case("GET", "/category/", "/category/?include=notes", 200),
+    Case("GET", "/category/{category_id}", "/category/1?include=notes", 200),
+    Case(
+        "PATCH",
+        "/category/{category_id}/update",
+        "/category/1/update",
+        200,
+        {"name": "renamed"},
+        True,
+    ),
+    Case("DELETE", "/category/{category_id}", "/category/1", 204, None, True),
+]
+
+WEB_CASES = [
+    Case("GET", "/", "/", 200),
+    Case("GET", "/notes/", "/notes/", 200),
+    Case("GET", "/notes/new", "/notes/new", 200),
+    Case("GET", "/notes/{note_id}", "/notes/1", 200),
+    Case("GET", "/notes/{note_id}/edit", "/notes/1/edit", 200),
+    Case("GET", "/chat/", "/chat/", 200),
+]
+
+
+def declared_budget(method: str, path: str):
+    for route in app.routes:
+        if getattr(route, "path", None) == path and method in getattr(
+            route, "methods", ()
+        ):
+            return route.endpoint.query_budget
+    raise LookupError(f"{method} {path} is not routed")
+
+
+@pytest.fixture
+async def seeded(client, admin, user):
+    """Two categories and three notes of the user, ids start at 1."""
+    for name in ("c1", "c2"):
+        response = await client.post(
+            "/category/", json={"name": name}, headers=admin
+        )
+        assert response.status_code == 201, response.text
+    for category_ids in ([1, 2], [1], []):
+        response = await client.post(
+            "/note/",
+            json={"title": "apple", "category_ids": category_ids},
+            headers=user,
+        )
+        assert response.status_code == 201, response.text
+
+
+async def assert_within_budget(client, case, assert_query_budget, **kwargs):
+    budget = declared_budget(case.method, case.route)
+    with assert_query_budget(budget.max_statements, budget.max_repeats):
+        response = await client.request(
+            case.method, case.url, json=case.json, **kwargs
+        )
+    assert response.status_code == case.status, response.text
+
+
+@pytest.mark.parametrize(
+    "case", CASES, ids=[f"{case.method} {case.url}" for case in CASES]
+)
+async def test_api_within_budget(
+    client, admin, user, seeded, assert_query_budget, case
+):
+    await assert_within_budget(
+        client,
+        case,
+        assert_query_budget,
+        headers=admin if case.as_admin else user,
+    )
+
+
+@pytest.mark.parametrize(
+    "case", WEB_CASES, ids=[f"{case.method} {case.url}" for case in WEB_CASES]
+)
+async def test_web_within_budget(client, seeded, assert_query_budget, case):
+    response = await client.post(
+        "/auth/login-form",
+        data={"email": "user@example.com", "password": "password123"},
+    )
+    assert response.status_code == 303, response.text
+    await assert_within_budget(client, case, assert_query_budget)
+
+
+async def test_web_create_within_budget(client, seeded, assert_query_budget):
+    response = await client.post(
+        "/auth/login-form",
+        data={"email": "user@example.com", "password": "password123"},
+    )
+    assert response.status_code == 303, response.text
+    budget = declared_budget("POST", "/notes/create")
+    with assert_query_budget(budget.max_statements, budget.max_repeats):
+        response = await client.post(
+            "/notes/create", data={"title": "x", "category_ids": ["1", "2"]}
+        )
+    assert response.status_code == 303, response.text
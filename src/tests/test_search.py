@@ -0,0 +1,80 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def search(client, headers, q: str) -> list:
+    response = await client.get(
+        "/note/search", params={"q": q}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return [hit["note"]["title"] for hit in response.json()["items"]]
+
+
+async def create_note(client, headers, title: str, text: str = "") -> int:
+    response = await client.post(
+        "/note/", json={"title": title, "text": text}, headers=headers
+    )
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+async def test_search_is_scoped_to_owner(client, admin, user):
+    await create_note(client, admin, "admin apple")
+    await create_note(client, user, "user apple")
+
+    assert await search(client, user, "apple") == ["user apple"]
+    assert sorted(await search(client, admin, "apple")) == [
+        "admin apple",
+        "user apple",
+    ]
+
+
+async def test_search_ranks_title_above_text(client, user):
+    await create_note(client, user, "groceries", "buy an apple")
+    await create_note(client, user, "apple pie")
+
+    assert await search(client, user, "apple") == ["apple pie", "groceries"]
+
+
+async def test_search_follows_updates_and_deletes(client, user):
+    note_id = await create_note(client, user, "apple")
+    response = await client.patch(
+        f"/note/{note_id}/update", json={"title": "pear"}, headers=user
+    )
+    assert response.status_code == 200, response.text
+    assert await search(client, user, "apple") == []
+    assert await search(client, user, "pear") == ["pear"]
+
+    response = await client.delete(f"/note/{note_id}/delete", headers=user)
+    assert response.status_code == 204
+    assert await search(client, user, "pear") == []
+
+
+@pytest.mark.parametrize("q", ["   ", "\t"])
+async def test_blank_query_returns_empty_page(client, user, q):
+    await create_note(client, user, "apple")
+
+    assert await search(client, user, q) == []
+
+
+@pytest.mark.parametrize(
+    "q", ['"', "apple OR", "NEAR(apple", "title:apple", "apple*", "-"]
+)
+async def test_fts5_syntax_is_not_parsed(client, user, q):
+    await create_note(client, user, "apple")
+
+    await search(client, user, q)
+
+
+async def test_highlight_escapes_note_markup(client, user):
+    await create_note(client, user, "<b>apple</b>", "<script>apple</script>")
+
+    response = await client.get(
+        "/note/search", params={"q": "apple"}, headers=user
+    )
+    assert response.status_code == 200, response.text
+    hit = response.json()["items"][0]
+    assert hit["title_highlight"] == "&lt;b&gt;<mark>apple</mark>&lt;/b&gt;"
+    assert "<script>" not in hit["text_highlight"]
+    assert "<mark>apple</mark>" in hit["text_highlight"]
@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from benchmarks.memory_redis import MemoryRedis
+from notes.core.config import settings
+from notes.core.redis import set_redis
+from notes.core.user_cache import UserCache, UserSnapshot
+
+pytestmark = pytest.mark.anyio
+
+NOW = datetime.now(timezone.utc)
+ADMIN = UserSnapshot(
+    id=1,
+    email="admin@example.com",
+    is_active=True,
+    is_superuser=False,
+    is_verified=False,
+    is_admin=True,
+    created_at=NOW,
+    updated_at=NOW,
+)
+
+
+@pytest.fixture
+def workers():
+    """Two user caches sharing one Redis, like two app workers."""
+    set_redis(MemoryRedis())
+    return UserCache(), UserCache()
+
+
+@pytest.mark.parametrize("shared", [False, True])
+async def test_invalidation_reaches_other_workers(
+    workers, monkeypatch, shared
+):
+    monkeypatch.setattr(settings, "USER_CACHE_USE_REDIS", shared)
+    writer, reader = workers
+    version = await reader.current_version(ADMIN.id)
+    await reader.set(ADMIN, version)
+    assert await reader.get(ADMIN.id, version) == ADMIN
+
+    await writer.invalidate(ADMIN.id)
+
+    version = await reader.current_version(ADMIN.id)
+    assert await reader.get(ADMIN.id, version) is None
+    assert await writer.get(ADMIN.id, version) is None